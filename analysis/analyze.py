@@ -78,6 +78,43 @@ def parse_txt_to_dataframe(file_path):
         data.append(current_student)
     return pd.DataFrame(data)
 
+# Cột lấy từ file JSONL / Parquet của crawler (giữ id, họ / tên riêng; đổi tên cho khớp parser text)
+STRUCTURED_COLUMNS = ['id', 'student_id', 'first_name', 'last_name', 'email', 'birth_date', 'hometown',
+                      'math', 'literature', 'english']
+
+def find_structured_file(txt_path):
+    """File Parquet / JSONL cùng phiên crawl với file text (ưu tiên Parquet)"""
+    base = os.path.splitext(txt_path)[0]
+    for ext in ('.parquet', '.jsonl'):
+        if os.path.exists(base + ext):
+            return base + ext
+    return None
+
+def load_structured_file(file_path):
+    """Đọc file Parquet (1 lần đọc theo cột) hoặc JSONL, trả về DataFrame cùng cột với parse_txt_to_dataframe"""
+    file_name = os.path.basename(file_path)
+    print(f"--> Đang đọc file: {file_name}")
+    if file_path.endswith('.parquet'):
+        df = pd.read_parquet(file_path, columns=STRUCTURED_COLUMNS)
+    else:
+        df = pd.read_json(file_path, lines=True, precise_float=True, dtype={'student_id': str, 'birth_date': str})
+        df = df.reindex(columns=STRUCTURED_COLUMNS)
+    # first_name là Họ, last_name là Tên (như form nhập trên frontend)
+    df['full_name'] = (df['first_name'].fillna('') + ' ' + df['last_name'].fillna('')).str.strip()
+    df = df.rename(columns={'birth_date': 'dob'})
+    df['source_file'] = file_name
+    return df
+
+def load_crawl_dataframe(txt_path):
+    """Ưu tiên Parquet -> JSONL của cùng phiên crawl, không có (hoặc đọc lỗi) mới parse file text"""
+    structured_path = find_structured_file(txt_path)
+    if structured_path:
+        try:
+            return load_structured_file(structured_path)
+        except (ImportError, ValueError) as e:
+            print(f"⚠️ Không đọc được {os.path.basename(structured_path)} ({e}), chuyển sang đọc file text")
+    return parse_txt_to_dataframe(txt_path)
+
 def validate_full_row(row):
     """(Giữ nguyên logic validate của bạn)"""
     errors = []
@@ -295,8 +332,8 @@ if __name__ == "__main__":
     file_id = os.path.splitext(os.path.basename(latest_file))[0]
     print(f"📂 Đang xử lý: {file_id}")
 
-    # 1. Parsing
-    df = parse_txt_to_dataframe(latest_file)
+    # 1. Parsing (Parquet / JSONL nếu có, không thì file text)
+    df = load_crawl_dataframe(latest_file)
 
     # 2. Validating & Cleaning
     df['error_log'] = df.apply(validate_full_row, axis=1)
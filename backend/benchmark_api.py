@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+# Chạy được cả khi đứng ở thư mục gốc lẫn thư mục backend
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+# ===== BENCHMARK API (in-process) =====
+# Chạy FastAPI app ngay trong process qua httpx.ASGITransport (không cần bật server),
+# trên file SQLite tạm đã nạp sẵn N sinh viên, đo throughput + latency p50/p99 cho
+# list / get-by-id / create / update / delete. Kết quả ghi ra file JSON (kèm commit git)
+# để so sánh giữa các lần thay đổi code.
+#
+# Mỗi kích thước dữ liệu chạy trong 1 process con riêng: database.engine, cache, metrics
+# được khởi tạo lúc import nên cần process mới cho mỗi file DB.
+#
+# Cách chạy: python backend/benchmark_api.py --sizes 1000,100000,1000000 --requests 500
+# Cần: pip install httpx
+
+DEFAULT_SIZES = "1000,100000,1000000"
+SEED_BATCH_SIZE = 50000
+OPERATIONS = ("list", "get", "create", "update", "delete")
+LAST_NAMES = ["Van An", "Thi Binh", "Van Cuong", "Thi Dung", "Van Hung", "Thi Lan", "Van Minh", "Thi Nga"]
+HOMETOWNS = ["Ha Noi", "Hai Phong", "Da Nang", "Hue", "Nghe An", "Can Tho", "TP HCM", "Quang Ninh"]
+
+def make_student(i: int, rng: random.Random) -> dict:
+    """Dữ liệu sinh viên thứ i (mã SV / email suy ra từ i, điểm ngẫu nhiên theo seed)"""
+    return {
+        "student_id": f"SV{i:07d}",
+        "first_name": "Nguyen",
+        "last_name": LAST_NAMES[i % len(LAST_NAMES)],
+        "email": f"sv{i}@example.com",
+        "birth_date": date(2000 + i % 6, i % 12 + 1, i % 28 + 1),
+        "hometown": HOMETOWNS[i % len(HOMETOWNS)],
+        "math": round(rng.uniform(0, 10), 1),
+        "literature": round(rng.uniform(0, 10), 1),
+        "english": round(rng.uniform(0, 10), 1),
+    }
+
+def seed(rows: int, seed_value: int):
+    """
+    Nạp dữ liệu trước khi import main: bảng được tạo chưa có trigger FTS / nhật ký xóa,
+    init_db (lúc import main) sẽ tạo trigger và build FTS index 1 lần cho cả bảng.
+    """
+    from sqlalchemy import insert
+    import database, models
+
+    models.Base.metadata.create_all(bind=database.engine)
+    rng = random.Random(seed_value)
+    with database.engine.begin() as conn:
+        for start in range(1, rows + 1, SEED_BATCH_SIZE):
+            end = min(start + SEED_BATCH_SIZE, rows + 1)
+            conn.execute(insert(models.Student), [make_student(i, rng) for i in range(start, end)])
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    def percentile(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else None,
+        "mean_ms": statistics.fmean(ordered) * 1000 if ordered else None,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+    }
+
+async def run_operation(client, requests: list, concurrency: int) -> dict:
+    """
+    Gửi danh sách request (method, url, json, status mong đợi) với `concurrency` worker.
+    Latency tính cho từng request; status khác mong đợi -> đếm lỗi.
+    """
+    queue = list(reversed(requests))
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            method, url, payload, expected = queue.pop()
+            start = time.perf_counter()
+            response = await client.request(method, url, json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != expected:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+async def benchmark(rows: int, count: int, concurrency: int, seed_value: int) -> dict:
+    import httpx
+    import main, pagination
+
+    rng = random.Random(seed_value + 1)
+    new_ids = list(range(rows + 1, rows + count + 1))
+
+    def payload(i: int) -> dict:
+        data = make_student(i, rng)
+        data["birth_date"] = data["birth_date"].isoformat()
+        return data
+
+    plans = {
+        # trang 100 dòng bắt đầu từ vị trí ngẫu nhiên (keyset cursor)
+        "list": [
+            ("GET", f"/students/?limit=100&cursor={pagination.encode_cursor(f'SV{rng.randint(1, rows):07d}')}", None, 200)
+            for _ in range(count)
+        ],
+        "get": [("GET", f"/students/{rng.randint(1, rows)}", None, 200) for _ in range(count)],
+        "create": [("POST", "/students/", payload(i), 201) for i in new_ids],
+        # PUT giữ nguyên mã SV / email của dòng (không trùng với SV khác), đổi điểm
+        "update": [("PUT", f"/students/{i}", payload(i), 200) for i in (rng.randint(1, rows) for _ in range(count))],
+        # xóa lại đúng các dòng vừa tạo -> kích thước bảng giữ nguyên sau mỗi lần chạy
+        "delete": [("DELETE", f"/students/{i}", None, 200) for i in new_ids],
+    }
+
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # warm-up: mở connection, nạp page cache của SQLite
+        for _ in range(min(50, count)):
+            await client.get(f"/students/{rng.randint(1, rows)}")
+        for operation in OPERATIONS:
+            results[operation] = await run_operation(client, plans[operation], concurrency)
+    return results
+
+def run_size(rows: int, args) -> dict:
+    """Chạy benchmark cho 1 kích thước dữ liệu trong process con với DB tạm riêng"""
+    tmp_dir = tempfile.mkdtemp(prefix=f"bench_api_{rows}_")
+    env = dict(
+        os.environ,
+        STUDENT_DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'students.db')}",
+        STUDENT_CACHE_TTL=os.environ.get("STUDENT_CACHE_TTL", "30" if args.cache else "0"),
+    )
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker",
+        "--rows", str(rows), "--requests", str(args.requests),
+        "--concurrency", str(args.concurrency), "--seed", str(args.seed),
+    ]
+    try:
+        completed = subprocess.run(command, env=env, cwd=tmp_dir, capture_output=True, text=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark {rows} dòng lỗi:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def worker_main(args):
+    start = time.perf_counter()
+    seed(args.rows, args.seed)
+    seed_seconds = time.perf_counter() - start
+    results = asyncio.run(benchmark(args.rows, args.requests, args.concurrency, args.seed))
+    print(json.dumps({"rows": args.rows, "seed_seconds": seed_seconds, "operations": results}))
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API in-process trên nhiều kích thước dữ liệu")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Danh sách số dòng, cách nhau bởi dấu phẩy")
+    parser.add_argument("--requests", type=int, default=500, help="Số request cho mỗi thao tác")
+    parser.add_argument("--concurrency", type=int, default=1, help="Số request gửi song song")
+    parser.add_argument("--seed", type=int, default=42, help="Seed sinh dữ liệu (cố định để so sánh được)")
+    parser.add_argument("--cache", action="store_true", help="Bật response cache (mặc định tắt để đo DB)")
+    parser.add_argument("--output", default="benchmark_api_results.json", help="File JSON kết quả")
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    print("=" * 78)
+    print(f"BENCHMARK API: {args.requests} request/thao tác, concurrency={args.concurrency}, "
+          f"cache={'bật' if args.cache else 'tắt'}")
+    print("=" * 78)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "db_mode": os.getenv("STUDENT_DB_MODE", "sync"),
+        "db_profile": os.getenv("STUDENT_DB_PROFILE", "default"),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "cache": args.cache,
+        "seed": args.seed,
+        "results": [],
+    }
+    for rows in sizes:
+        result = run_size(rows, args)
+        report["results"].append(result)
+        print(f"\n📦 {rows:,} dòng (seed {result['seed_seconds']:.1f}s)")
+        for operation, stats in result["operations"].items():
+            print(f"   {operation:<7} {stats['rps']:>9.1f} req/s | p50 {stats['p50_ms']:>7.2f} ms | "
+                  f"p99 {stats['p99_ms']:>7.2f} ms | lỗi {stats['errors']}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print("-" * 78)
+    print(f"💾 Đã ghi kết quả: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import insert, select, text, update
+
+# Chạy được cả khi đứng ở thư mục gốc lẫn thư mục backend
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import database
+import models
+
+# ===== BENCHMARK STORAGE PROFILE =====
+# So sánh throughput đọc/ghi đồng thời trên cùng 1 file SQLite giữa
+# profile "default" (rollback journal) và "production" (WAL + PRAGMA).
+# Mô phỏng tải của API: nhiều reader đọc trang danh sách, 1 writer cập nhật điểm
+# (mỗi reader / writer là 1 process). Mỗi profile chạy --repeat lần, lấy median.
+# Reader giữ nhịp --read-rps (mặc định 100 req/s mỗi reader) để writer không bị đói CPU trên máy ít core:
+# khi đó số ghi/s phản ánh chi phí commit + khóa file, còn read/s thấp hơn nhịp đặt ra = reader bị chặn.
+# --write-batch N: writer commit sau mỗi N dòng (giống PATCH /students/bulk) thay vì từng dòng.
+#
+# Cách chạy: python backend/benchmark_storage.py --rows 20000 --readers 4 --seconds 5 --write-batch 1
+
+def seed(engine, rows: int):
+    """Tạo bảng và nạp dữ liệu mẫu vào DB tạm"""
+    models.Base.metadata.create_all(bind=engine)
+    payload = [
+        {
+            "student_id": f"SV{i:07d}",
+            "first_name": "Nguyen",
+            "last_name": "Van A",
+            "email": f"sv{i}@example.com",
+            "birth_date": date(2005, 1, 1),
+            "hometown": "Ha Noi",
+            "math": 5.0,
+            "literature": 5.0,
+            "english": 5.0,
+        }
+        for i in range(1, rows + 1)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.Student), payload)
+
+def reader(db_path: str, profile: str, rows: int, read_rps: float, deadline: float, results):
+    """
+    Process đọc: trang danh sách 100 dòng từ vị trí ngẫu nhiên (keyset), mỗi lần = 1 read transaction.
+    read_rps > 0: giữ nhịp cố định như tải API thật (không chiếm hết CPU của writer); 0 = đọc liên tục
+    """
+    engine = database.create_sqlite_engine(f"sqlite:///{db_path}", profile=profile)
+    rng = random.Random()
+    done = errors = 0
+    next_at = time.perf_counter()
+    with engine.connect() as conn:
+        while time.perf_counter() < deadline:
+            if read_rps:
+                next_at += 1 / read_rps
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            after = f"SV{rng.randint(1, rows):07d}"
+            try:
+                conn.execute(
+                    select(models.Student.__table__)
+                    .where(models.Student.student_id > after)
+                    .order_by(models.Student.student_id)
+                    .limit(100)
+                ).all()
+                conn.rollback()  # kết thúc read transaction, giống 1 request
+                done += 1
+            except Exception:
+                conn.rollback()
+                errors += 1
+    engine.dispose()
+    results.put(("reads", done, errors))
+
+def writer(db_path: str, profile: str, rows: int, write_batch: int, deadline: float, results):
+    """Process ghi: cập nhật điểm, commit sau mỗi `write_batch` dòng (1 = mỗi request ghi 1 commit)"""
+    engine = database.create_sqlite_engine(f"sqlite:///{db_path}", profile=profile)
+    rng = random.Random()
+    done = errors = 0
+    with engine.connect() as conn:
+        while time.perf_counter() < deadline:
+            try:
+                for _ in range(write_batch):
+                    conn.execute(
+                        update(models.Student)
+                        .where(models.Student.id == rng.randint(1, rows))
+                        .values(math=round(rng.uniform(0, 10), 1))
+                    )
+                conn.commit()
+                done += write_batch
+            except Exception:
+                conn.rollback()
+                errors += 1
+    engine.dispose()
+    results.put(("writes", done, errors))
+
+def run_profile(profile: str, rows: int, readers: int, read_rps: float, seconds: float, write_batch: int) -> dict:
+    """
+    Chạy 1 lần đo trên DB tạm (tự xóa khi xong). Reader / writer là các process riêng như khi chạy
+    nhiều worker (WEB_CONCURRENCY): không tranh GIL với nhau, chỉ tranh khóa file SQLite.
+    """
+    with tempfile.TemporaryDirectory(prefix=f"bench_{profile}_") as tmp_dir:
+        db_path = os.path.join(tmp_dir, "students.db")
+        engine = database.create_sqlite_engine(f"sqlite:///{db_path}", profile=profile)
+        seed(engine, rows)
+        with engine.connect() as conn:
+            journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+        engine.dispose()
+
+        results = multiprocessing.Queue()
+        deadline = time.perf_counter() + seconds
+        processes = [
+            multiprocessing.Process(target=reader, args=(db_path, profile, rows, read_rps, deadline, results))
+            for _ in range(readers)
+        ]
+        processes.append(
+            multiprocessing.Process(target=writer, args=(db_path, profile, rows, write_batch, deadline, results))
+        )
+        for process in processes:
+            process.start()
+        counters = {"reads": 0, "writes": 0, "errors": 0}
+        for _ in processes:
+            kind, done, errors = results.get()
+            counters[kind] += done
+            counters["errors"] += errors
+        for process in processes:
+            process.join()
+
+    return {
+        "profile": profile,
+        "journal_mode": journal_mode,
+        "reads_per_sec": counters["reads"] / seconds,
+        "writes_per_sec": counters["writes"] / seconds,
+        "errors": counters["errors"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQLite storage profile (default vs production)")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--read-rps", type=float, default=100.0, help="Nhịp đọc của mỗi reader (0 = không giới hạn)")
+    parser.add_argument("--write-batch", type=int, default=1, help="Số dòng cập nhật mỗi commit của writer")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần đo mỗi profile (lấy median)")
+    args = parser.parse_args()
+    write_batch = max(1, args.write_batch)
+
+    print("=" * 70)
+    print(f"BENCHMARK STORAGE: {args.rows} dòng, {args.readers} reader ({args.read_rps:g} req/s) + 1 writer (process riêng), "
+          f"{write_batch} dòng/commit, {args.seconds}s x {args.repeat} lần mỗi profile")
+    print("=" * 70)
+
+    results = {}
+    for profile in ("default", "production"):
+        runs = [run_profile(profile, args.rows, args.readers, args.read_rps, args.seconds, write_batch) for _ in range(max(1, args.repeat))]
+        result = {
+            "journal_mode": runs[0]["journal_mode"],
+            "reads_per_sec": statistics.median(run["reads_per_sec"] for run in runs),
+            "writes_per_sec": statistics.median(run["writes_per_sec"] for run in runs),
+            "errors": sum(run["errors"] for run in runs),
+        }
+        results[profile] = result
+        print(f"{profile:<11} (journal={result['journal_mode']:<6}) "
+              f"read: {result['reads_per_sec']:>9.1f} req/s | "
+              f"write: {result['writes_per_sec']:>8.1f} dòng/s | lỗi: {result['errors']}")
+
+    base, prod = results["default"], results["production"]
+    print("-" * 70)
+    if base["reads_per_sec"]:
+        print(f"📈 Read  x{prod['reads_per_sec'] / base['reads_per_sec']:.2f}")
+    if base["writes_per_sec"]:
+        print(f"📈 Write x{prod['writes_per_sec'] / base['writes_per_sec']:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+# ===== RESPONSE CACHE (in-process, LRU + TTL) =====
+# Cache body JSON đã serialize của các GET /students/... để request lặp lại
+# không phải query SQLite và serialize lại. Mọi route ghi gọi invalidate().
+# Nhiều worker (WEB_CONCURRENCY > 1): cache nằm trong từng process nên cần 1 "phiên bản" dùng chung.
+# CACHE_VERSION_FILE (main.py tự đặt khi chạy nhiều worker): invalidate() ghi thêm 1 byte vào file,
+# get()/set() so (mtime, size) của file (1 lần stat) -> worker khác ghi thì cache của worker này bị xóa,
+# không trả body / ETag cũ.
+CACHE_MAX_ENTRIES = int(os.getenv("STUDENT_CACHE_SIZE", "128"))
+CACHE_TTL = float(os.getenv("STUDENT_CACHE_TTL", "30"))
+CACHE_VERSION_FILE = os.getenv("STUDENT_CACHE_VERSION_FILE")
+CACHE_VERSION_FILE_MAX = 4096  # file phiên bản dài quá thì cắt về 0 (chỉ so bằng, không so lớn hơn)
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    expires_at: float
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag = hash nội dung body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """So khớp header If-None-Match (có thể là danh sách hoặc "*")"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+class ResponseCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL,
+                 version_file: Optional[str] = CACHE_VERSION_FILE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Tăng mỗi lần invalidate (kể cả do process khác ghi): response tính từ dữ liệu cũ sẽ không được lưu
+        self.generation = 0
+        self.version_file = version_file
+        self._shared_version = self._read_shared_version()
+
+    def _read_shared_version(self):
+        if self.version_file is None:
+            return None
+        try:
+            stat = os.stat(self.version_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _sync_shared_version(self):
+        """Gọi khi đang giữ lock: process khác đã invalidate -> bỏ toàn bộ entry của process này"""
+        if self.version_file is None:
+            return
+        version = self._read_shared_version()
+        if version != self._shared_version:
+            self._shared_version = version
+            self.generation += 1
+            self._entries.clear()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            self._sync_shared_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)  # LRU: vừa dùng -> đưa về cuối
+            return entry
+
+    def set(self, key: str, body: bytes, generation: int, headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        """
+        Lưu response vào cache và trả về entry (kèm ETag).
+        `generation` là giá trị đọc TRƯỚC khi query DB; nếu đã có ghi xen giữa thì không lưu.
+        """
+        entry = CachedResponse(body, make_etag(body), headers or {}, time.monotonic() + self.ttl)
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return entry
+        with self._lock:
+            self._sync_shared_version()
+            if generation != self.generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)  # bỏ entry lâu không dùng nhất
+        return entry
+
+    def invalidate(self):
+        """Xóa toàn bộ cache (gọi sau mỗi thao tác ghi)"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            if self.version_file is not None:
+                with open(self.version_file, "ab") as f:
+                    if f.tell() >= CACHE_VERSION_FILE_MAX:
+                        f.truncate(0)
+                    f.write(b".")
+                self._shared_version = self._read_shared_version()
+
+response_cache = ResponseCache()
@@ -1,6 +1,12 @@
+from sqlalchemy import Integer, String, and_, bindparam, cast, delete, func, insert, or_, select, text, type_coerce, update
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.expression import UnaryExpression
 from datetime import datetime
-import models, schemas
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import models, schemas, pagination
 
 # --- READ ---
 def get_student(db: Session, student_id: int):
@@ -12,48 +18,493 @@ def get_student_by_student_code(db: Session, student_code: str):
 def get_student_by_email(db: Session, email: str):
     return db.query(models.Student).filter(models.Student.email == email).first()
 
-def get_all_students(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Student).order_by(models.Student.student_id).offset(skip).limit(limit).all()
+# Các cột cho phép sắp xếp (đều có index (cột, student_id) và (hometown, cột, student_id) trong models.Student)
+SORT_COLUMNS = {
+    "student_id": models.Student.student_id,
+    "math": models.Student.math,
+    "literature": models.Student.literature,
+    "english": models.Student.english,
+}
+
+def apply_filters(query, filters: Optional[schemas.StudentFilter]):
+    """Thêm điều kiện WHERE theo bộ lọc (mỗi điều kiện dùng được index tương ứng)"""
+    if filters is None:
+        return query
+    student = models.Student
+    if filters.hometown is not None:
+        query = query.where(student.hometown == filters.hometown)
+    for name in ("math", "literature", "english"):
+        column = getattr(student, name)
+        low, high = getattr(filters, f"{name}_min"), getattr(filters, f"{name}_max")
+        if low is not None:
+            query = query.where(column >= low)
+        if high is not None:
+            query = query.where(column <= high)
+    if filters.birth_date_from is not None:
+        query = query.where(student.birth_date >= filters.birth_date_from)
+    if filters.birth_date_to is not None:
+        query = query.where(student.birth_date <= filters.birth_date_to)
+    return query
+
+def count_students(db: Session, filters: Optional[schemas.StudentFilter] = None) -> int:
+    """Số sinh viên khớp bộ lọc (COUNT(*) trên index nhỏ nhất, không tính thống kê như /students/stats)"""
+    return db.scalar(apply_filters(select(func.count()).select_from(models.Student), filters))
+
+def _range_columns(filters: Optional[schemas.StudentFilter]) -> Set[str]:
+    """Các cột đang bị lọc theo khoảng (min/max, từ ngày/đến ngày)"""
+    if filters is None:
+        return set()
+    names = {
+        name for name in ("math", "literature", "english")
+        if getattr(filters, f"{name}_min") is not None or getattr(filters, f"{name}_max") is not None
+    }
+    if filters.birth_date_from is not None or filters.birth_date_to is not None:
+        names.add("birth_date")
+    return names
+
+def _no_index_order(column):
+    """
+    `+cột` trong ORDER BY: cùng thứ tự nhưng SQLite không dùng index của cột để sắp xếp được.
+    Có lọc khoảng trên cột khác -> ép planner SEARCH theo index của cột lọc rồi sort phần đã lọc,
+    thay vì đi dọc index sắp xếp và bỏ dần các dòng không khớp (gần như quét cả bảng khi lọc hẹp).
+    """
+    return UnaryExpression(column, operator=operators.custom_op("+"), type_=column.type)
+
+def _after_cursor(column, descending: bool, after: pagination.Cursor):
+    """
+    Điều kiện keyset "nằm sau dòng cuối trang trước" cho khóa (column, student_id).
+    SQLite xếp NULL lên đầu khi ASC và xuống cuối khi DESC.
+    DESC với cursor có giá trị: chỉ lấy các dòng không NULL (điều kiện có `OR cột IS NULL` làm SQLite
+    không seek được trên index); các dòng NULL ở cuối được đọc bằng query thứ 2, xem students_queries.
+    """
+    code = models.Student.student_id
+    if column is code:
+        return code < after.student_code if descending else code > after.student_code
+    value = after.sort_value
+    if descending:
+        if value is None:
+            return and_(column.is_(None), code < after.student_code)
+        return or_(column < value, and_(column == value, code < after.student_code))
+    if value is None:
+        return or_(and_(column.is_(None), code > after.student_code), column.is_not(None))
+    return or_(column > value, and_(column == value, code > after.student_code))
+
+def students_query(
+    columns=None,
+    filters: Optional[schemas.StudentFilter] = None,
+    sort_by: str = "student_id",
+    descending: bool = False,
+    after: Optional[pagination.Cursor] = None
+):
+    """
+    Câu SELECT danh sách dùng chung cho JSON, stream NDJSON và export:
+    lọc + sắp xếp theo (cột, student_id) + keyset sau cursor.
+    `columns` = None -> trả ORM object Student.
+    """
+    query = select(*columns) if columns is not None else select(models.Student)
+    query = apply_filters(query, filters)
+    column = SORT_COLUMNS[sort_by]
+    if after is not None:
+        query = query.where(_after_cursor(column, descending, after))
+    code = models.Student.student_id
+    sort_key = column
+    if _range_columns(filters) - {sort_by}:
+        sort_key = _no_index_order(column)
+    if column is code:
+        return query.order_by(sort_key.desc() if descending else sort_key)
+    return query.order_by(sort_key.desc(), code.desc()) if descending else query.order_by(sort_key, code)
+
+def students_queries(
+    columns=None,
+    filters: Optional[schemas.StudentFilter] = None,
+    sort_by: str = "student_id",
+    descending: bool = False,
+    after: Optional[pagination.Cursor] = None
+) -> list:
+    """
+    Các câu SELECT cần chạy lần lượt để đọc danh sách sau cursor (đọc hết câu trước mới sang câu sau).
+    Thường chỉ 1 câu; DESC theo cột điểm với cursor có giá trị -> thêm 1 câu cho các dòng NULL ở cuối.
+    """
+    queries = [students_query(columns, filters, sort_by, descending, after)]
+    if descending and after is not None and sort_by != "student_id" and after.sort_value is not None:
+        column = SORT_COLUMNS[sort_by]
+        queries.append(students_query(columns, filters, sort_by, descending).where(column.is_(None)))
+    return queries
+
+def get_students(
+    db: Session,
+    filters: Optional[schemas.StudentFilter] = None,
+    sort_by: str = "student_id",
+    descending: bool = False,
+    after: Optional[pagination.Cursor] = None,
+    skip: int = 0,
+    limit: int = 100,
+    columns=None
+):
+    """
+    `columns` = None -> list ORM object Student;
+    có `columns` (projection ?fields=) -> list tuple đúng các cột đó, không tạo ORM object.
+    """
+    # Keyset pagination (after): nhảy thẳng tới vị trí trên index,
+    # nên trang 1 hay trang 10.000 đều tốn như nhau (không dùng OFFSET)
+    rows = []
+    for query in students_queries(columns, filters=filters, sort_by=sort_by, descending=descending, after=after):
+        if after is None and skip:
+            query = query.offset(skip)
+        query = query.limit(limit - len(rows))
+        rows += db.execute(query).all() if columns is not None else db.scalars(query).all()
+        if len(rows) >= limit:
+            break
+    return rows
+
+def _chunks(values: list, size: int = 500):
+    # SQLite giới hạn số tham số trong 1 câu lệnh -> chia nhỏ danh sách IN (...)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def get_existing_ids(db: Session, ids: Iterable[int]) -> Set[int]:
+    """Trả về các ID Database đang tồn tại (1 query IN cho mỗi 500 ID)"""
+    found = set()
+    for chunk in _chunks(list(set(ids))):
+        found.update(db.scalars(select(models.Student.id).where(models.Student.id.in_(chunk))))
+    return found
+
+def get_existing_student_codes(db: Session, student_codes: Iterable[str]) -> Set[str]:
+    """Trả về các mã SV đã có trong DB (1 query IN cho mỗi 500 mã)"""
+    found = set()
+    for chunk in _chunks(list(set(student_codes))):
+        found.update(db.scalars(select(models.Student.student_id).where(models.Student.student_id.in_(chunk))))
+    return found
+
+def student_codes_taken(db: Session, rows: Iterable[Tuple[Optional[int], str]]) -> bool:
+    """
+    `rows`: các cặp (ID SV đang ghi, None nếu tạo mới; mã SV muốn ghi).
+    True nếu có mã SV đã thuộc về SV khác trong DB hoặc bị trùng ngay trong các dòng này.
+    """
+    rows = [(row_id, code) for row_id, code in rows if code is not None]
+    codes = [code for _, code in rows]
+    if len(set(codes)) < len(codes):
+        return True
+    owners = {}
+    for chunk in _chunks(codes):
+        owners.update(db.execute(
+            select(models.Student.student_id, models.Student.id).where(models.Student.student_id.in_(chunk))
+        ).all())
+    return any(owners.get(code) not in (None, row_id) for row_id, code in rows)
+
+def get_existing_emails(db: Session, emails: Iterable[str]) -> Set[str]:
+    """Trả về các email đã có trong DB (1 query IN cho mỗi 500 email)"""
+    found = set()
+    for chunk in _chunks(list(set(emails))):
+        found.update(db.scalars(select(models.Student.email).where(models.Student.email.in_(chunk))))
+    return found
+
+# --- CHANGE FEED ---
+# Thời gian ghi bởi CURRENT_TIMESTAMP chỉ chính xác tới giây và transaction ghi có thể
+# commit sau thời điểm nó lấy timestamp, nên mốc đọc tiếp theo lùi lại vài giây:
+# client có thể nhận lại 1 dòng 2 lần (upsert là idempotent) nhưng không bỏ sót.
+CHANGE_FEED_LAG_SECONDS = 5
+
+def get_changes(
+    db: Session,
+    since: Optional[str] = None,
+    after_id: Optional[int] = None,
+    after_seq: Optional[int] = None,
+    limit: int = 1000
+) -> dict:
+    """
+    Đọc các dòng được tạo/sửa từ mốc `since` (chuỗi 'YYYY-MM-DD HH:MM:SS' UTC, None = từ đầu)
+    và các tombstone sau `after_seq` (None = các lần xóa từ mốc `since`).
+    Trả về dữ liệu trang hiện tại + vị trí đọc tiếp theo.
+    """
+    student = models.Student
+    # So sánh updated_at dưới dạng chuỗi thô (cùng định dạng CURRENT_TIMESTAMP) để dùng index
+    updated_at = type_coerce(student.updated_at, String)
+    now = db.execute(select(func.datetime("now", f"-{CHANGE_FEED_LAG_SECONDS} seconds"))).scalar()
+
+    # 1. Upsert: keyset trên (updated_at, id); updated_at NULL (dữ liệu cũ chưa từng sửa) xếp đầu
+    query = select(student, updated_at.label("updated_at_raw"))
+    if since is None:
+        if after_id is not None:
+            query = query.where(or_(
+                and_(student.updated_at.is_(None), student.id > after_id),
+                student.updated_at.is_not(None)
+            ))
+    elif after_id is None:
+        query = query.where(updated_at >= since)
+    else:
+        query = query.where(or_(updated_at > since, and_(updated_at == since, student.id > after_id)))
+    rows = db.execute(query.order_by(student.updated_at, student.id).limit(limit + 1)).all()
+    more_upserts = len(rows) > limit
+    rows = rows[:limit]
+
+    # 2. Tombstone: theo seq tăng dần
+    deletion = models.StudentDeletion
+    deleted_at = type_coerce(deletion.deleted_at, String)
+    deleted_query = select(deletion.seq, deletion.deleted_id, deletion.student_id, deleted_at.label("deleted_at"))
+    if after_seq is not None:
+        deleted_query = deleted_query.where(deletion.seq > after_seq)
+    elif since is not None:
+        deleted_query = deleted_query.where(deleted_at >= since)
+    deleted = db.execute(deleted_query.order_by(deletion.seq).limit(limit + 1)).all()
+    more_deletes = len(deleted) > limit
+    deleted = deleted[:limit]
+
+    # 3. Vị trí đọc tiếp theo
+    if more_upserts:
+        next_since, next_after_id = rows[-1].updated_at_raw, rows[-1].Student.id
+    else:
+        next_since, next_after_id = now, None
+    if more_deletes:
+        next_seq = deleted[-1].seq
+    else:
+        # đã đọc hết tombstone -> lần sau chỉ cần các lần xóa mới hơn seq lớn nhất hiện tại
+        next_seq = max(db.execute(select(func.max(deletion.seq))).scalar() or 0, after_seq or 0)
+
+    return {
+        "upserts": [(row.Student, row.updated_at_raw) for row in rows],
+        "deletes": [
+            {"seq": row.seq, "id": row.deleted_id, "student_id": row.student_id, "deleted_at": row.deleted_at}
+            for row in deleted
+        ],
+        "next_since": next_since,
+        "next_after_id": next_after_id,
+        "next_seq": next_seq,
+        "has_more": more_upserts or more_deletes,
+    }
+
+# --- SEARCH (FTS5) ---
+def make_match_query(q: str) -> Optional[str]:
+    """
+    Chuyển chuỗi người dùng nhập thành biểu thức MATCH của FTS5:
+    bỏ dấu (giống cách index), mỗi từ là 1 prefix query, các từ ghép bằng AND.
+    Ví dụ: "Nguyễn Vă" -> '"nguyen"* "va"*'. Trả về None nếu không có từ nào.
+    """
+    folded = unicodedata.normalize("NFD", q.replace("đ", "d").replace("Đ", "D"))
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch)).lower()
+    tokens = re.findall(r"\w+", folded)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def search_students(db: Session, match_query: str, skip: int = 0, limit: int = 20):
+    """Tìm kiếm full-text, xếp hạng bằng bm25 (họ/tên có trọng số cao hơn email/quê quán)"""
+    statement = text(
+        f"SELECT students.* FROM {models.SEARCH_TABLE} "
+        f"JOIN students ON students.id = {models.SEARCH_TABLE}.rowid "
+        f"WHERE {models.SEARCH_TABLE} MATCH :q "
+        f"ORDER BY bm25({models.SEARCH_TABLE}, 10.0, 10.0, 2.0, 1.0), students.id "
+        f"LIMIT :limit OFFSET :skip"
+    ).bindparams(q=match_query, limit=limit, skip=skip)
+    return db.scalars(select(models.Student).from_statement(statement)).all()
+
+# --- STATISTICS ---
+# Điểm TB 3 môn làm tròn 2 chữ số và xếp loại, giống classify_student trong analysis/analyze.py
+# (thiếu 1 môn -> NULL -> 'N/A')
+# avg_score / rank là generated column trong models.Student (SQLite tự tính khi ghi)
+AVG_SCORE = models.Student.avg_score
+RANK = models.Student.rank
+RANK_LABELS = ['Giỏi', 'Khá', 'Trung Bình', 'Yếu', 'N/A']
+
+def get_student_stats(db: Session) -> dict:
+    """Thống kê tổng hợp tính hoàn toàn bằng SQL (GROUP BY), không tải từng dòng về Python"""
+    subjects = {
+        "math": models.Student.math,
+        "literature": models.Student.literature,
+        "english": models.Student.english,
+    }
+
+    # 1. Tổng quan: số SV + count/mean/min/max từng môn (1 query)
+    overview_columns = [func.count().label("count"), func.avg(AVG_SCORE).label("avg_score")]
+    for name, column in subjects.items():
+        overview_columns += [
+            func.count(column).label(f"{name}_count"),
+            func.avg(column).label(f"{name}_mean"),
+            func.min(column).label(f"{name}_min"),
+            func.max(column).label(f"{name}_max"),
+        ]
+    overview = db.execute(select(*overview_columns)).mappings().one()
+
+    # 2. Phân bố xếp loại
+    rank = RANK.label("rank")
+    ranks = {label: 0 for label in RANK_LABELS}
+    for row in db.execute(select(rank, func.count()).group_by(rank)):
+        ranks[row[0]] = row[1]
+
+    # 3. Theo quê quán
+    hometowns = db.execute(
+        select(
+            models.Student.hometown,
+            func.count().label("count"),
+            func.avg(AVG_SCORE).label("avg_score"),
+            func.avg(models.Student.math).label("math"),
+            func.avg(models.Student.literature).label("literature"),
+            func.avg(models.Student.english).label("english"),
+        )
+        .group_by(models.Student.hometown)
+        .order_by(func.avg(AVG_SCORE).desc())
+    ).mappings().all()
+
+    # 4. Theo tháng sinh (birth_date lưu dạng 'YYYY-MM-DD')
+    month = cast(func.strftime("%m", models.Student.birth_date), Integer).label("month")
+    birth_months = db.execute(
+        select(month, func.count().label("count"), func.avg(AVG_SCORE).label("avg_score"))
+        .group_by(month)
+        .order_by(month)
+    ).mappings().all()
+
+    return {
+        "count": overview["count"],
+        "avg_score": overview["avg_score"],
+        "subjects": {
+            name: {
+                "count": overview[f"{name}_count"],
+                "mean": overview[f"{name}_mean"],
+                "min": overview[f"{name}_min"],
+                "max": overview[f"{name}_max"],
+            }
+            for name in subjects
+        },
+        "ranks": ranks,
+        "hometowns": [dict(row) for row in hometowns],
+        "birth_months": [dict(row) for row in birth_months],
+    }
+
+# --- BẢNG XẾP HẠNG ---
+def get_top_students(db: Session, n: int = 10, hometown: Optional[str] = None) -> List[models.Student]:
+    """
+    Top n sinh viên theo điểm TB (bằng điểm -> mã SV tăng dần), có thể lọc theo quê quán.
+    ORDER BY khớp đúng index (avg_score DESC, student_id) / (hometown, avg_score DESC, student_id)
+    nên SQLite chỉ đọc n dòng đầu của index.
+    """
+    query = select(models.Student).where(AVG_SCORE.is_not(None))
+    if hometown:
+        query = query.where(models.Student.hometown == hometown)
+    query = query.order_by(AVG_SCORE.desc(), models.Student.student_id).limit(n)
+    return db.execute(query).scalars().all()
 
 # --- CREATE ---
+def _student_values(student: schemas.StudentCreate) -> dict:
+    """Chuyển schema input thành dict cột -> giá trị để INSERT"""
+    return {
+        "student_id": student.student_id,
+        "first_name": student.first_name,
+        "last_name": student.last_name,
+        "email": student.email,
+        "birth_date": datetime.strptime(student.birth_date, '%Y-%m-%d').date(),
+        "hometown": student.hometown,
+        "math": student.math,
+        "literature": student.literature,
+        "english": student.english,
+    }
+
 def create_student(db: Session, student: schemas.StudentCreate):
-    # Convert string date to python date object
-    birth_date_obj = datetime.strptime(student.birth_date, '%Y-%m-%d').date()
-    
-    db_student = models.Student(
-        student_id=student.student_id,
-        first_name=student.first_name,
-        last_name=student.last_name,
-        email=student.email,
-        birth_date=birth_date_obj,
-        hometown=student.hometown,
-        math=student.math,
-        literature=student.literature,
-        english=student.english
-    )
-    db.add(db_student)
+    """
+    INSERT ... RETURNING: 1 câu lệnh vừa ghi vừa lấy lại dòng (không cần db.refresh).
+    Trùng mã SV/email -> IntegrityError từ UNIQUE index, router tự map sang lỗi 400.
+    """
+    table = models.Student.__table__
+    row = db.execute(
+        insert(table).values(**_student_values(student)).returning(*table.c)
+    ).mappings().one()
     db.commit()
-    db.refresh(db_student)
-    return db_student
+    return dict(row)
+
+def create_students_bulk(db: Session, students: List[schemas.StudentCreate]) -> dict:
+    """
+    Insert nhiều sinh viên trong 1 transaction (executemany, 1 lần commit).
+    Trả về dict {student_id: id} của các dòng vừa tạo.
+    """
+    if not students:
+        return {}
+    # Core insert trên Table (không qua ORM bulk insert: ORM bỏ các giá trị None rồi chia lô theo tập cột,
+    # dòng có điểm NULL khác nhau -> tách thành nhiều câu INSERT). Mọi dòng cùng đủ cột -> 1 executemany
+    # (insertmanyvalues); created_at / updated_at vẫn lấy default func.now() của cột.
+    table = models.Student.__table__
+    rows = db.execute(
+        insert(table).returning(table.c.id, table.c.student_id),
+        [_student_values(student) for student in students]
+    ).all()
+    db.commit()
+    return {row.student_id: row.id for row in rows}
 
 # --- UPDATE ---
-def update_student(db: Session, db_student: models.Student, student_update: schemas.StudentCreate):
-    # Update fields
-    db_student.first_name = student_update.first_name
-    db_student.last_name = student_update.last_name
-    db_student.email = student_update.email
-    db_student.birth_date = datetime.strptime(student_update.birth_date, '%Y-%m-%d').date()
-    db_student.hometown = student_update.hometown
-    db_student.math = student_update.math
-    db_student.literature = student_update.literature
-    db_student.english = student_update.english
-    # student_id thường không cho sửa, nhưng nếu muốn sửa thì thêm vào đây
+def update_student(db: Session, student_id: int, student_update: schemas.StudentCreate):
+    """
+    UPDATE ... RETURNING theo ID: trả về dòng sau khi sửa, hoặc None nếu không tồn tại.
+    student_id (mã SV) cũng được cập nhật; trùng với SV khác -> IntegrityError.
+    """
+    table = models.Student.__table__
+    row = db.execute(
+        update(table)
+        .where(table.c.id == student_id)
+        .values(**_student_values(student_update))
+        .returning(*table.c)
+    ).mappings().one_or_none()
+    db.commit()
+    return dict(row) if row is not None else None
+
+def _patch_values(patch: schemas.StudentPatch) -> dict:
+    """Chỉ các trường client gửi lên (PATCH) -> dict cột -> giá trị để UPDATE"""
+    values = patch.model_dump(exclude_unset=True)
+    if "birth_date" in values:
+        values["birth_date"] = datetime.strptime(values["birth_date"], '%Y-%m-%d').date()
+    return values
+
+def patch_student(db: Session, student_id: int, patch: schemas.StudentPatch):
+    """
+    PATCH: UPDATE ... RETURNING chỉ các cột client gửi lên (1 câu lệnh, không SELECT trước).
+    Trả về dòng sau khi sửa, hoặc None nếu không tồn tại.
+    """
+    table = models.Student.__table__
+    row = db.execute(
+        update(table)
+        .where(table.c.id == student_id)
+        .values(**_patch_values(patch))
+        .returning(*table.c)
+    ).mappings().one_or_none()
+    db.commit()
+    return dict(row) if row is not None else None
+
+def update_students_bulk(db: Session, updates: List[Tuple[int, schemas.StudentPatch]]) -> int:
+    """
+    Cập nhật nhiều SV trong 1 transaction. Các dòng sửa cùng tập cột được gom thành
+    1 lệnh UPDATE executemany (mỗi tập cột 1 câu lệnh đã prepare), thay vì 1 round-trip/dòng.
+    Trả về số dòng đã cập nhật.
+    """
+    table = models.Student.__table__
+    groups: Dict[Tuple[str, ...], List[dict]] = {}
+    for student_id, patch in updates:
+        values = _patch_values(patch)
+        groups.setdefault(tuple(sorted(values)), []).append({"_id": student_id, **values})
 
+    # SET lấy theo các key trong dict tham số (ngoài _id) -> cùng nhóm thì cùng câu lệnh
+    statement = update(table).where(table.c.id == bindparam("_id"))
+    updated = 0
+    for rows in groups.values():
+        updated += db.execute(statement, rows).rowcount
     db.commit()
-    db.refresh(db_student)
-    return db_student
+    return updated
 
 # --- DELETE ---
 def delete_student(db: Session, db_student: models.Student):
     db.delete(db_student)
-    db.commit()
\ No newline at end of file
+    db.commit()
+
+def delete_students(
+    db: Session,
+    ids: Optional[List[int]] = None,
+    filters: Optional[schemas.StudentFilter] = None
+) -> int:
+    """
+    Xóa hàng loạt bằng 1 câu DELETE (theo danh sách ID và/hoặc điều kiện lọc).
+    Trigger trong DB tự dọn FTS index và ghi tombstone cho change feed.
+    Trả về số dòng đã xóa.
+    """
+    statement = delete(models.Student)
+    if ids is not None:
+        statement = statement.where(models.Student.id.in_(ids))
+    statement = apply_filters(statement, filters)
+    deleted = db.execute(statement).rowcount
+    db.commit()
+    return deleted
@@ -1,15 +1,70 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+import metrics
 
 # ===== DATABASE CONFIG =====
-# Đường dẫn database SQLite
-DATABASE_URL = "sqlite:///./data/students.db"
+# Đường dẫn database SQLite (đổi sang file khác, vd DB tạm cho benchmark: STUDENT_DATABASE_URL=sqlite:////tmp/x.db)
+DATABASE_URL = os.getenv("STUDENT_DATABASE_URL", "sqlite:///./data/students.db")
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+# Chế độ truy cập DB của API: "sync" (mặc định, route chạy trên threadpool)
+# hoặc "async" (AsyncSession + aiosqlite, cần `pip install aiosqlite`)
+# Ví dụ: STUDENT_DB_MODE=async python main.py
+DB_MODE = os.getenv("STUDENT_DB_MODE", "sync").lower()
+
+# Storage profile: "default" (rollback journal như SQLite mặc định)
+# hoặc "production" (WAL + PRAGMA đã tinh chỉnh + pool có kích thước rõ ràng)
+# Ví dụ: STUDENT_DB_PROFILE=production python main.py
+DB_PROFILE = os.getenv("STUDENT_DB_PROFILE", "default").lower()
+
+# PRAGMA áp dụng cho MỖI connection mới ở profile production
+PRODUCTION_PRAGMAS = {
+    "journal_mode": "WAL",      # reader không bị chặn bởi writer đang commit
+    "synchronous": "NORMAL",    # an toàn với WAL, bớt fsync mỗi lần commit
+    "busy_timeout": 5000,       # chờ tối đa 5s khi DB đang bị khóa thay vì lỗi ngay
+    "mmap_size": 268435456,     # đọc file qua memory-map (256MB)
+    "cache_size": -65536,       # page cache ~64MB cho mỗi connection (số âm = KB)
+    "temp_store": "MEMORY",
+}
+
+# Kích thước pool ở profile production (mỗi worker process có pool riêng)
+POOL_SIZE = int(os.getenv("STUDENT_DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("STUDENT_DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = 30
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Event hook "connect": chạy các PRAGMA production trên connection vừa mở"""
+    cursor = dbapi_connection.cursor()
+    for name, value in PRODUCTION_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def engine_options(profile: str = DB_PROFILE) -> dict:
+    """Tham số create_engine theo profile"""
+    options = {"connect_args": {"check_same_thread": False}}  # SQLite specific
+    if profile == "production":
+        options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT)
+    return options
+
+def create_sqlite_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    """Tạo engine SQLite theo profile (dùng chung cho API và benchmark)"""
+    new_engine = create_engine(url, **engine_options(profile))
+    if profile == "production":
+        event.listen(new_engine, "connect", apply_sqlite_pragmas)
+    return new_engine
+
+def instrument_engine(target_engine):
+    """Gắn hook đếm/đo thời gian query (xem metrics.py) lên engine của API"""
+    event.listen(target_engine, "before_cursor_execute", metrics.before_cursor_execute)
+    event.listen(target_engine, "after_cursor_execute", metrics.after_cursor_execute)
+    event.listen(target_engine, "handle_error", metrics.handle_error)
 
 # Tạo engine SQLite
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # SQLite specific
-)
+engine = create_sqlite_engine(DATABASE_URL)
+instrument_engine(engine)
 
 # Tạo SessionLocal để giao dịch với database
 SessionLocal = sessionmaker(
@@ -31,3 +86,53 @@ def get_db():
         yield db # trả về session cho caller
     finally:
         db.close() 
+
+# ===== ASYNC DATABASE (chỉ khởi tạo khi DB_MODE = "async") =====
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(DB_PROFILE))
+    if DB_PROFILE == "production":
+        event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    instrument_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        autoflush=False,
+        # object trả về sau commit vẫn đọc được mà không cần lazy-load (không có IO ngoài greenlet)
+        expire_on_commit=False
+    )
+
+async def get_async_db():
+    """
+    Phiên bản async của get_db: trả về AsyncSession
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency dùng trong router, chọn theo DB_MODE
+get_session = get_async_db if DB_MODE == "async" else get_db
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Chạy 1 hàm trong crud.py (nhận Session làm tham số đầu) trên session hiện tại.
+    - AsyncSession: dùng run_sync -> IO đi qua aiosqlite, không chiếm threadpool
+    - Session (sync): chạy trên threadpool như route `def` trước đây
+    Lỗi bất kỳ -> rollback rồi raise lại cho router xử lý.
+    """
+    if isinstance(db, Session):
+        def call():
+            try:
+                return fn(db, *args, **kwargs)
+            except Exception:
+                db.rollback()
+                raise
+        return await run_in_threadpool(call)
+
+    try:
+        return await db.run_sync(fn, *args, **kwargs)
+    except Exception:
+        await db.rollback()
+        raise
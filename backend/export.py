@@ -0,0 +1,152 @@
+import csv
+import io
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select
+
+import crud, database, models, schemas
+from streaming import RAW_COLUMNS, STUDENT_COLUMNS
+
+# ===== EXPORT DỮ LIỆU (CSV / PARQUET / ARROW IPC) =====
+# Đọc bảng students từ server-side cursor theo lô cố định rồi encode từng lô
+# và gửi ngay -> bộ nhớ chỉ phụ thuộc EXPORT_BATCH_SIZE, không phụ thuộc số dòng.
+# Parquet/Arrow cần pyarrow (tùy chọn): `pip install pyarrow`
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_BATCH_SIZE = 10000
+
+EXPORT_FORMATS = {
+    # format: (media type, đuôi file)
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+COLUMN_NAMES = [column.key for column in STUDENT_COLUMNS]
+
+def arrow_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("student_id", pa.string()),
+        ("first_name", pa.string()),
+        ("last_name", pa.string()),
+        ("email", pa.string()),
+        ("birth_date", pa.date32()),
+        ("hometown", pa.string()),
+        ("math", pa.float64()),
+        ("literature", pa.float64()),
+        ("english", pa.float64()),
+        ("avg_score", pa.float64()),
+        ("rank", pa.string()),
+    ])
+
+# birth_date lấy nguyên chuỗi 'YYYY-MM-DD' từ SQLite (bỏ bước parse sang date của SQLAlchemy)
+EXPORT_COLUMNS = list(RAW_COLUMNS.values())
+
+def iter_row_batches(
+    filters: Optional[schemas.StudentFilter] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[List[tuple]]:
+    """
+    Đọc các dòng (tuple theo thứ tự COLUMN_NAMES) theo lô từ server-side cursor.
+    Sắp xếp theo id (rowid) -> SQLite đọc tuần tự trên bảng, không nhảy qua lại theo index.
+    """
+    query = crud.apply_filters(select(*EXPORT_COLUMNS), filters).order_by(models.Student.id)
+    with database.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for partition in result.partitions():
+            yield partition
+
+class _ChunkSink:
+    """File-like object ghi vào bộ đệm; mỗi lần pop() lấy phần bytes mới ghi để stream đi"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def csv_chunks(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMN_NAMES)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _record_batch(batch: List[tuple], schema):
+    # Chuyển lô dòng -> cột rồi tạo RecordBatch (nhanh hơn from_pylist từng dict)
+    columns = list(zip(*batch))
+    arrays = []
+    for values, field in zip(columns, schema):
+        if field.type == pa.date32():
+            arrays.append(pa.array(values, type=pa.string()).cast(field.type))  # 'YYYY-MM-DD' -> date32
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def parquet_chunks(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """Mỗi lô = 1 row group; bytes của row group được gửi ngay khi ghi xong"""
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="snappy")
+    for batch in batches:
+        writer.write_batch(_record_batch(batch, schema))
+        yield sink.pop()
+    writer.close()
+    yield sink.pop()
+
+def arrow_chunks(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """Arrow IPC stream format: đọc được bằng pyarrow.ipc.open_stream / pandas"""
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+    yield sink.pop()
+    for batch in batches:
+        writer.write_batch(_record_batch(batch, schema))
+        yield sink.pop()
+    writer.close()
+    yield sink.pop()
+
+ENCODERS = {
+    "csv": csv_chunks,
+    "parquet": parquet_chunks,
+    "arrow": arrow_chunks,
+}
+
+def export_chunks(export_format: str, filters: Optional[schemas.StudentFilter] = None) -> Iterator[bytes]:
+    return ENCODERS[export_format](iter_row_batches(filters))
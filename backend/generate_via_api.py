@@ -1,16 +1,22 @@
-import requests
+import argparse
+import asyncio
 import random
 import time
 import sys
 import os
+from collections import Counter
 from datetime import datetime, timedelta
 
+import httpx
+
 # ===== 1. CẤU HÌNH IMPORT DB (ĐỂ XÓA DỮ LIỆU CŨ) =====
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Import phẳng giống các module trong backend (models.py import `database`), để seed_direct
+# dùng chung đúng 1 bản models/database thay vì nạp thêm bản "backend.models"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from backend.database import SessionLocal
-    from backend.models import Student
+    from database import SessionLocal
+    from models import Student
     print("✅ Đã kết nối thành công với Database (Direct Connection).")
 except ImportError:
     print("⚠️  CẢNH BÁO: Không tìm thấy module 'backend'. Chế độ xóa DB cũ sẽ không hoạt động.")
@@ -19,6 +25,12 @@ except ImportError:
 API_URL = "http://127.0.0.1:8000/students/"
 TARGET_DB_COUNT = 1000
 
+# Mặc định cho load generator (đổi bằng tham số dòng lệnh, xem --help)
+DEFAULT_CONCURRENCY = 20    # số request gửi song song (= số connection keep-alive)
+DEFAULT_RPS = 0             # tốc độ mục tiêu (request/giây), 0 = không giới hạn
+DEFAULT_INVALID_RATIO = 0.2 # 20% request cố tình sai format để test validation
+REQUEST_TIMEOUT = 10.0
+
 # Dữ liệu nguồn
 FIRST_NAMES = ["nguyen", "Tran", "le", "PHAM", "Hoang", "Dang", "Vu", "bui", "trinh", "TiEu", "phAM", "DINH", "Unknown"]
 LAST_NAMES = ["van a", "Thi B", "Van C", "thi d", "Minh E", "Ngoc F", "Tuan G", "duc h", "tieu i", "huu t", ""]
@@ -27,12 +39,12 @@ HOMETOWNS = ["ha noi", "TP.HCM", "Da Nang", "Hai Phong", "Can Tho", "Nghe An", "
 def clear_database():
     """Hàm xóa sạch dữ liệu cũ"""
     try:
+        # 1 câu DELETE (không count trước). Muốn quay về 1 dataset cố định: python backend/snapshot.py restore <tên>
         db = SessionLocal()
-        num_rows = db.query(Student).count()
+        num_rows = db.query(Student).delete(synchronize_session=False)
+        db.commit()
         if num_rows > 0:
-            print(f"🧹 Đang xóa {num_rows} bản ghi cũ...")
-            db.query(Student).delete()
-            db.commit()
+            print(f"🧹 Đã xóa {num_rows} bản ghi cũ.")
             print("✨ Database đã sạch sẽ!")
         db.close()
     except Exception as e:
@@ -95,56 +107,194 @@ def get_invalid_payload(index):
         "english": 5.0
     }
 
-def generate_mixed_data():
-    # 1. Xóa dữ liệu cũ
-    clear_database()
+class LoadGenerator:
+    """
+    Bắn request POST song song bằng asyncio + 1 httpx.AsyncClient dùng chung
+    (pool connection keep-alive, không mở connection mới cho mỗi request).
+    - concurrency: số worker (mỗi worker giữ tối đa 1 request đang chờ)
+    - rps: tốc độ mục tiêu; request thứ n được lên lịch tại start + n / rps
+    - invalid_ratio: tỉ lệ request dữ liệu sai (get_invalid_payload)
+    Giống bản tuần tự cũ: chạy tới khi tạo thành công đủ `count` SV; dữ liệu "bẩn" bị API
+    từ chối (422) thì mã SV đó được bắn lại với dữ liệu ngẫu nhiên mới.
+    """
 
-    print(f"\n🚀 BẮT ĐẦU CHIẾN DỊCH: Nạp {TARGET_DB_COUNT} sinh viên vào DB.")
-    print("📋 Chiến thuật: 70% Gmail xịn, 30% Email rác. Xen kẽ bắn lỗi để test API.")
-    print("-" * 70)
+    def __init__(self, url: str, count: int, concurrency: int, rps: float, invalid_ratio: float, verbose: bool):
+        self.url = url
+        self.count = count
+        self.concurrency = concurrency
+        self.rps = rps
+        self.invalid_ratio = invalid_ratio
+        self.verbose = verbose
 
-    success_count = 0
-    total_attempts = 0 # Biến đếm tổng số lần bắn
+        self.attempts = 0           # số request đã lên lịch (cả hợp lệ lẫn lỗi)
+        self.valid_sent = 0         # số mã SV (SVxxx) đã cấp
+        self.valid_in_flight = 0    # số request dữ liệu hợp lệ đang chờ response
+        self.retry_indexes = []     # mã SV bị từ chối, cần bắn lại
+        self.success_count = 0      # số SV tạo thành công (201)
+        self.skipped = 0            # số mã SV bỏ qua (lỗi không phải do dữ liệu, vd: trùng)
+        self.statuses = Counter()   # status code -> số request ("conn_error" nếu lỗi kết nối)
+        self.latencies = {"valid": [], "invalid": []}
+        self.start = 0.0
+        self.server_down = False
 
-    while success_count < TARGET_DB_COUNT:
-        total_attempts += 1
-        
-        # 20% cố tình bắn lỗi format (Test API), 80% bắn data (Nạp DB)
-        is_force_fail = random.random() < 0.2 
-
-        if is_force_fail:
-            # Bắn data LỖI
-            try:
-                requests.post(API_URL, json=get_invalid_payload(total_attempts))
-                # Không in log lỗi để đỡ rối, chỉ tính vào tổng attempts
-            except:
-                pass
+    def next_request(self):
+        """Lấy request tiếp theo (số thứ tự, loại, payload) hoặc None nếu đã đủ"""
+        if self.server_down or self.success_count + self.skipped + self.valid_in_flight >= self.count:
+            return None
+        self.attempts += 1
+        if random.random() < self.invalid_ratio:
+            return self.attempts, "invalid", get_invalid_payload(self.attempts)
+        if self.retry_indexes:
+            index = self.retry_indexes.pop()
         else:
-            # Bắn data SẠCH (về format)
-            payload = get_dirty_but_valid_payload(success_count + 1)
+            self.valid_sent += 1
+            index = self.valid_sent
+        self.valid_in_flight += 1
+        return self.attempts, "valid", (index, get_dirty_but_valid_payload(index))
+
+    async def worker(self, client: httpx.AsyncClient):
+        while True:
+            request = self.next_request()
+            if request is None:
+                return
+            attempt, kind, payload = request
+            index = None
+            if kind == "valid":
+                index, payload = payload
+            if self.rps:
+                # Giới hạn tốc độ: chờ tới thời điểm được lên lịch của request này
+                delay = self.start + (attempt - 1) / self.rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            sent_at = time.perf_counter()
             try:
-                response = requests.post(API_URL, json=payload)
-                if response.status_code == 201:
-                    success_count += 1
+                response = await client.post(self.url, json=payload)
+            except httpx.HTTPError as e:
+                self.statuses["conn_error"] += 1
+                if kind == "valid":
+                    self.valid_in_flight -= 1
+                    self.retry_indexes.append(index)
+                if isinstance(e, httpx.ConnectError):
+                    self.server_down = True
+                    return
+                continue
+            self.latencies[kind].append(time.perf_counter() - sent_at)
+            self.statuses[response.status_code] += 1
+            if kind == "invalid":
+                continue
+
+            self.valid_in_flight -= 1
+            if response.status_code == 201:
+                self.success_count += 1
+                if self.verbose:
                     data = response.json()
-                    # In log gọn
-                    print(f"✅ [{success_count:03d}/{TARGET_DB_COUNT}] {data['student_id']} | {data['email']}")
+                    print(f"✅ [{self.success_count:03d}/{self.count}] {data['student_id']} | {data['email']}")
+            else:
+                if response.status_code == 422:
+                    self.retry_indexes.append(index)  # dữ liệu bẩn bị chặn -> bắn lại mã SV này
                 else:
+                    # vd: 400 trùng mã SV khi chạy --keep -> bỏ qua mã này để không lặp vô hạn
+                    self.skipped += 1
+                if self.verbose:
                     print(f"❌ Lỗi Server: {response.text}")
-            except requests.exceptions.ConnectionError:
-                print("⛔ FATAL: Chưa bật Server (main.py)!")
-                return
-        
-        time.sleep(0.02) 
 
-    # ===== PHẦN THỐNG KÊ BẠN CẦN =====
+    async def run(self) -> float:
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=REQUEST_TIMEOUT) as client:
+            self.start = time.perf_counter()
+            await asyncio.gather(*(self.worker(client) for _ in range(self.concurrency)))
+            return time.perf_counter() - self.start
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else 0.0
+
+def print_report(generator: LoadGenerator, elapsed: float):
+    all_latencies = generator.latencies["valid"] + generator.latencies["invalid"]
+    completed = len(all_latencies)
     print("=" * 70)
     print("📊 TỔNG KẾT CHIẾN DỊCH:")
-    print(f"   - Tổng số Request đã bắn:      {total_attempts}")
-    print(f"   - Số bản ghi nạp thành công:   {success_count} (Pass vào DB)")
-    print(f"   - Số bản ghi bị API chặn/Lỗi:  {total_attempts - success_count} (Fail/Invalid)")
+    print(f"   - Tổng số Request đã bắn:      {completed}")
+    print(f"   - Số bản ghi nạp thành công:   {generator.success_count} (Pass vào DB)")
+    print(f"   - Số bản ghi bị API chặn/Lỗi:  {completed - generator.success_count} (Fail/Invalid)")
+    print(f"   - Status code:                 {dict(sorted(generator.statuses.items(), key=str))}")
+    print("-" * 70)
+    target = f"{generator.rps:g} req/s" if generator.rps else "không giới hạn"
+    print(f"⚡ Throughput: {completed / elapsed if elapsed else 0:.1f} req/s "
+          f"(mục tiêu: {target}, concurrency={generator.concurrency}) trong {elapsed:.2f}s")
+    print(f"{'Loại':<10}{'Số req':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, values in (("valid", generator.latencies["valid"]), ("invalid", generator.latencies["invalid"]), ("all", all_latencies)):
+        print(f"{kind:<10}{len(values):>8}{percentile(values, 0.5):>10.2f}{percentile(values, 0.9):>10.2f}"
+              f"{percentile(values, 0.99):>10.2f}{max(values) * 1000 if values else 0:>10.2f}")
     print("=" * 70)
+
+def generate_mixed_data(args):
+    # 1. Xóa dữ liệu cũ
+    if not args.keep:
+        clear_database()
+
+    print(f"\n🚀 BẮT ĐẦU CHIẾN DỊCH: Nạp {args.count} sinh viên vào DB.")
+    print(f"📋 Chiến thuật: 70% Gmail xịn, 30% Email rác. {args.invalid_ratio:.0%} request cố tình sai để test API.")
+    print("-" * 70)
+
+    generator = LoadGenerator(
+        url=args.url,
+        count=args.count,
+        concurrency=args.concurrency,
+        rps=args.rps,
+        invalid_ratio=args.invalid_ratio,
+        verbose=not args.quiet,
+    )
+    elapsed = asyncio.run(generator.run())
+    if generator.server_down:
+        print("⛔ FATAL: Chưa bật Server (main.py)!")
+        return
+
+    print_report(generator, elapsed)
     print("🎉 Dữ liệu đã sẵn sàng cho bài tập Selenium & Pandas!")
 
+def seed_direct_mode(args):
+    """
+    Ghi thẳng vào SQLite (không qua API): sinh dữ liệu bằng NumPy cùng phân phối tên / quê quán /
+    email / điểm với get_dirty_but_valid_payload, cố định theo --seed. Dùng cho dataset hàng triệu dòng.
+    Tên rỗng bị API chặn nên không được sinh (giống kết quả cuối cùng của chế độ API).
+    """
+    import seed_direct
+
+    print(f"\n🚀 SEED TRỰC TIẾP: {args.count:,} sinh viên vào DB (seed={args.seed}, "
+          f"{'nối thêm' if args.keep else 'xóa dữ liệu cũ'}).")
+    try:
+        result = seed_direct.seed_students(
+            rows=args.count,
+            first_names=[name for name in FIRST_NAMES if name.strip()],
+            last_names=[name for name in LAST_NAMES if name.strip()],
+            hometowns=HOMETOWNS,
+            seed=args.seed,
+            append=args.keep,
+        )
+    except ValueError as e:
+        print(f"⛔ {e}")
+        return
+    print(f"✅ Insert: {result['insert_seconds']:.1f}s | Tổng (kèm build index + FTS): {result['total_seconds']:.1f}s "
+          f"| {result['rows'] / result['total_seconds']:,.0f} dòng/s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tạo dữ liệu giả qua API / load test endpoint POST /students/")
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--count", type=int, default=TARGET_DB_COUNT, help="Số request dữ liệu hợp lệ")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Số request song song")
+    parser.add_argument("--rps", type=float, default=DEFAULT_RPS, help="Tốc độ mục tiêu (req/s), 0 = tối đa")
+    parser.add_argument("--invalid-ratio", type=float, default=DEFAULT_INVALID_RATIO, help="Tỉ lệ request sai format (0-1)")
+    parser.add_argument("--keep", action="store_true", help="Không xóa dữ liệu cũ trước khi chạy")
+    parser.add_argument("--quiet", action="store_true", help="Không in log từng sinh viên")
+    parser.add_argument("--direct", action="store_true", help="Ghi thẳng vào SQLite bằng NumPy (không qua API)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed cho chế độ --direct")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    generate_mixed_data()
\ No newline at end of file
+    args = parse_args()
+    if args.direct:
+        seed_direct_mode(args)
+    else:
+        generate_mixed_data(args)
@@ -1,17 +1,21 @@
+import os
+import tempfile
+import time
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 # Import database và models để tạo bảng
+import database
 from database import engine
-import models
+import models, schemas, metrics
 # Import router
 from routers import students
 
-# 1. Tạo bảng Database (nếu chưa có)
-models.Base.metadata.create_all(bind=engine)
+# 1. Tạo bảng Database (nếu chưa có) + index tìm kiếm FTS5
+models.init_db(engine)
 
 # 2. Khởi tạo App
 app = FastAPI(
@@ -27,36 +31,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "ETag", "X-Total-Count"],  # để frontend đọc được cursor trang sau / ETag / tổng số
 )
 
-# 4. Custom Error Handler (Giữ lại logic cũ của bạn)
+# 4. Đo latency / status code / số query SQL cho mỗi request (xuất ở /metrics)
+@app.middleware("http")
+async def collect_metrics(request: Request, call_next):
+    stats = metrics.registry.request_started()
+    token = metrics.current_request.set(stats)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Nhãn route là path template (vd: /students/{student_id}) để không nổ số series
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "<unmatched>"
+        metrics.registry.request_finished(
+            request.method, route_path, status_code, time.perf_counter() - start, stats
+        )
+        metrics.current_request.reset(token)
+
+# 5. Custom Error Handler (Giữ lại logic cũ của bạn)
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc: RequestValidationError):
-    errors = {}
-    for error in exc.errors():
-        # Xử lý an toàn trường hợp không có loc
-        field = error['loc'][-1] if error['loc'] else 'unknown'
-        message = error['msg']
-        
-        if 'at least 1 character' in message:
-            errors[field] = f'{field} khong duoc de trong'
-        elif 'ensure this value has at most' in message:
-            errors[field] = f'{field} vuot qua so ky tu toi da'
-        elif 'value is not a valid email address' in message:
-            errors[field] = 'Email khong hop le (vi du: abc@example.com)'
-        elif 'type_error' in message:
-            errors[field] = f'{field} co kieu du lieu khong chinh xac'
-        else:
-            errors[field] = message
-    
+    errors = schemas.format_validation_errors(exc.errors())
     return JSONResponse(
         status_code=422,
         content={"detail": errors}
     )
 
-# 5. Gắn Router vào App
+# 6. Gắn Router vào App
 app.include_router(students.router)
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Metrics dạng Prometheus text format (scrape bằng Prometheus / curl)"""
+    return Response(content=metrics.registry.render(), media_type=metrics.PROMETHEUS_MEDIA_TYPE)
+
 @app.get("/")
 
 def read_root():
@@ -66,4 +80,20 @@ def read_root():
     }
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Số worker process: WEB_CONCURRENCY=4 python main.py
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        # Nhiều process cùng ghi 1 file SQLite -> bắt buộc profile production
+        # (WAL cho reader/writer song song, busy_timeout để writer chờ nhau thay vì lỗi "database is locked").
+        # Biến môi trường được các worker process kế thừa khi import lại main:app.
+        os.environ["STUDENT_DB_PROFILE"] = "production"
+        if database.DB_PROFILE != "production":
+            print("⚙️  WEB_CONCURRENCY > 1: tự động bật STUDENT_DB_PROFILE=production cho các worker.")
+        # Response cache nằm trong từng worker -> dùng chung 1 file phiên bản để ghi ở worker này
+        # xóa cache của các worker khác (xem cache.py)
+        os.environ.setdefault(
+            "STUDENT_CACHE_VERSION_FILE", os.path.join(tempfile.gettempdir(), f"student-cache-{os.getpid()}.version")
+        )
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# ===== METRICS (Prometheus text format) =====
+# Thu thập trong process, không cần thư viện ngoài:
+# - HTTP: histogram latency theo (method, route), p50/p95/p99 trên cửa sổ mẫu gần nhất,
+#   số request đang xử lý, số response theo status code
+# - SQL: số query + thời gian query (hook before/after_cursor_execute trong database.py),
+#   đếm theo từng request qua contextvars
+# Lưu ý: mỗi worker process có bộ đếm riêng (WEB_CONCURRENCY > 1 -> mỗi lần scrape trúng 1 worker).
+logger = logging.getLogger("student_api.metrics")
+
+# Request chạy nhiều hơn N query -> log cảnh báo (thường là dấu hiệu N+1 query)
+QUERY_WARN_THRESHOLD = int(os.getenv("STUDENT_QUERY_WARN_THRESHOLD", "20"))
+
+# Mốc bucket (giây) cho histogram
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# Số mẫu gần nhất giữ lại để tính p50/p95/p99 cho mỗi route
+QUANTILE_WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class Histogram:
+    """Histogram tích lũy kiểu Prometheus + cửa sổ mẫu gần nhất để tính quantile"""
+
+    def __init__(self, buckets: Tuple[float, ...], window: int = 0):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # phần tử cuối = +Inf
+        self.total = 0.0
+        self.count = 0
+        self.samples = deque(maxlen=window) if window else None
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        if self.samples is not None:
+            self.samples.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+class RequestStats:
+    """Số query / tổng thời gian query của request hiện tại"""
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+# Gắn với request đang xử lý; threadpool (run_in_threadpool) và greenlet (run_sync)
+# kế thừa context nên hook SQL ghi được vào đúng object của request
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests: Dict[Tuple[str, str, int], int] = defaultdict(int)      # (method, route, status) -> số request
+        self.latency: Dict[Tuple[str, str], Histogram] = {}                     # (method, route) -> latency
+        self.request_queries: Dict[Tuple[str, str], Histogram] = {}             # (method, route) -> số query/request
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.query_errors = 0
+
+    # --- HTTP ---
+    def request_started(self) -> RequestStats:
+        with self._lock:
+            self.in_flight += 1
+        return RequestStats()
+
+    def request_finished(self, method: str, route: str, status_code: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[(method, route, status_code)] += 1
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS, QUANTILE_WINDOW)
+                self.request_queries[key] = Histogram((1, 2, 5, 10, 20, 50, 100))
+            self.latency[key].observe(seconds)
+            self.request_queries[key].observe(stats.queries)
+        if stats.queries > QUERY_WARN_THRESHOLD:
+            logger.warning(
+                "%s %s chạy %d query (%.1f ms SQL) - vượt ngưỡng %d",
+                method, route, stats.queries, stats.query_seconds * 1000, QUERY_WARN_THRESHOLD
+            )
+
+    # --- SQL ---
+    def query_finished(self, seconds: float, failed: bool = False):
+        with self._lock:
+            self.queries.observe(seconds)
+            if failed:
+                self.query_errors += 1
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += seconds
+
+    # --- Xuất Prometheus text ---
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            lines += [
+                "# HELP http_requests_in_flight Số request đang xử lý",
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+                "# HELP http_requests_total Số request theo method, route và status code",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route, status_code), value in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status_code}"}} {value}')
+
+            lines += [
+                "# HELP http_request_duration_seconds Latency request theo route",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (method, route), histogram in sorted(self.latency.items()):
+                lines += _histogram_lines("http_request_duration_seconds", f'method="{method}",route="{route}"', histogram)
+
+            lines += [
+                "# HELP http_request_duration_quantile_seconds p50/p95/p99 latency trên cửa sổ mẫu gần nhất",
+                "# TYPE http_request_duration_quantile_seconds gauge",
+            ]
+            for (method, route), histogram in sorted(self.latency.items()):
+                for q, value in histogram.quantiles().items():
+                    lines.append(
+                        f'http_request_duration_quantile_seconds{{method="{method}",route="{route}",quantile="{q}"}} {value:.6f}'
+                    )
+
+            lines += [
+                "# HELP http_request_db_queries Số query SQL trong mỗi request",
+                "# TYPE http_request_db_queries histogram",
+            ]
+            for (method, route), histogram in sorted(self.request_queries.items()):
+                lines += _histogram_lines("http_request_db_queries", f'method="{method}",route="{route}"', histogram)
+
+            lines += [
+                "# HELP db_query_duration_seconds Thời gian thực thi query SQL",
+                "# TYPE db_query_duration_seconds histogram",
+            ]
+            lines += _histogram_lines("db_query_duration_seconds", "", self.queries)
+            lines += [
+                "# HELP db_query_errors_total Số query SQL bị lỗi",
+                "# TYPE db_query_errors_total counter",
+                f"db_query_errors_total {self.query_errors}",
+            ]
+        return "\n".join(lines) + "\n"
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram) -> List[str]:
+    prefix = labels + "," if labels else ""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+    suffix = "{" + labels + "}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.total:.6f}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
+
+registry = MetricsRegistry()
+
+# ===== HOOK SQLALCHEMY =====
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    registry.query_finished(time.perf_counter() - conn.info["query_start_time"].pop())
+
+def handle_error(exception_context):
+    # Query lỗi không đi qua after_cursor_execute -> lấy thời điểm bắt đầu ra tại đây
+    conn = exception_context.connection
+    starts = conn.info.get("query_start_time") if conn is not None else None
+    if starts:
+        registry.query_finished(time.perf_counter() - starts.pop(), failed=True)
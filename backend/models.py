@@ -1,7 +1,19 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, CheckConstraint
+from contextlib import nullcontext
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, CheckConstraint, Computed, Index, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.sql import func
 from database import Base
 
+# Biểu thức của generated column (cùng công thức với analysis/analyze.py)
+AVG_SCORE_SQL = "round((math + literature + english) / 3.0, 2)"
+RANK_SQL = (
+    "CASE WHEN avg_score IS NULL THEN 'N/A' "
+    "WHEN avg_score >= 8.0 THEN 'Giỏi' "
+    "WHEN avg_score >= 6.5 THEN 'Khá' "
+    "WHEN avg_score >= 5.0 THEN 'Trung Bình' "
+    "ELSE 'Yếu' END"
+)
+
 class Student(Base):
     """
     SQLAlchemy Model cho bảng Students
@@ -17,6 +29,8 @@ class Student(Base):
     - math: Điểm toán (nullable)
     - literature: Điểm văn (nullable)
     - english: Điểm anh (nullable)
+    - avg_score: Điểm trung bình 3 môn (generated column, NULL nếu thiếu điểm)
+    - rank: Xếp loại theo avg_score (generated column, giống classify_student trong analysis)
     - created_at: Thời gian tạo
     - updated_at: Thời gian cập nhật
     """
@@ -39,6 +53,11 @@ class Student(Base):
     literature = Column(Float, nullable=True)
     english = Column(Float, nullable=True)
 
+    # Điểm TB + xếp loại do SQLite tự tính khi ghi (generated column) -> không bao giờ lệch với điểm,
+    # kể cả khi ghi bằng Core / bulk. DB cũ được bổ sung bằng ALTER TABLE trong init_db.
+    avg_score = Column(Float, Computed(AVG_SCORE_SQL, persisted=True))
+    rank = Column(String(20), Computed(RANK_SQL, persisted=True))
+
     # data integrity: toàn vẹn dữ liệu, là ràng buộc cứng tại DB và khác với input validate trong schemas
     __table_args__ = (
         # ràng buộc điểm số: Nếu ai đó cố tình INSERT điểm < 0 hoặc > 10, DB sẽ báo lỗi (IntegrityError)
@@ -48,11 +67,27 @@ class Student(Base):
         
         # đảm bảo mã SV không phải chuỗi rỗng, vì nullable=False chỉ đảm bảo không phải NULL
         CheckConstraint("length(student_id) > 0", name="check_student_id_not_empty"),
+
+        # index cho lọc/sắp xếp danh sách: luôn kèm student_id ở cuối để ORDER BY (cột, student_id)
+        # và keyset pagination đi thẳng trên index, không full table scan / không sort tạm
+        Index("ix_students_hometown_student_id", "hometown", "student_id"),
+        Index("ix_students_birth_date_student_id", "birth_date", "student_id"),
+        Index("ix_students_math_student_id", "math", "student_id"),
+        Index("ix_students_literature_student_id", "literature", "student_id"),
+        Index("ix_students_english_student_id", "english", "student_id"),
+        # lọc quê quán + sắp xếp theo điểm: SEARCH hometown=? và đọc sẵn theo thứ tự (không sort tạm)
+        Index("ix_students_hometown_math_student_id", "hometown", "math", "student_id"),
+        Index("ix_students_hometown_literature_student_id", "hometown", "literature", "student_id"),
+        Index("ix_students_hometown_english_student_id", "hometown", "english", "student_id"),
+
+        # change feed (?since=): đọc các dòng theo thứ tự (updated_at, id)
+        Index("ix_students_updated_at_id", "updated_at", "id"),
     )
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # default=func.now() (phía SQLAlchemy) để cả DB cũ tạo bảng khi chưa có server_default cũng được ghi thời gian
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), default=func.now(), onupdate=func.now())
 
     # Phần này cần xóa đi vì không dùng Pydantic model ở đây
     # Đây là SQLAlchemy model, không phải Pydantic model
@@ -60,5 +95,131 @@ class Student(Base):
     # Pydantic model để validate dữ liệu trong FastAPI
     # class Config:
     #     from_attributes = True  # Cho phép convert từ ORM object sang dict
- 
- 
\ No newline at end of file
+
+# Bảng xếp hạng (/students/top): index (avg_score DESC, student_id) -> đọc K dòng đầu của index,
+# không quét bảng / không sort; thêm hometown ở đầu cho bảng xếp hạng theo quê quán
+Index("ix_students_avg_score_student_id", Student.avg_score.desc(), Student.student_id)
+Index("ix_students_hometown_avg_score", Student.hometown, Student.avg_score.desc(), Student.student_id)
+
+
+class StudentDeletion(Base):
+    """
+    Nhật ký xóa (tombstone) cho change feed: mỗi dòng bị xóa khỏi students
+    được trigger ghi lại tại đây, kể cả khi xóa bằng Core / xóa hàng loạt.
+    """
+
+    __tablename__ = "student_deletions"
+    __table_args__ = {"sqlite_autoincrement": True}  # seq không bao giờ bị tái sử dụng
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)  # tăng dần, dùng làm vị trí đọc
+    deleted_id = Column(Integer, nullable=False)                 # students.id đã bị xóa
+    student_id = Column(String(20), nullable=False)              # mã SV đã bị xóa
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+CHANGE_LOG_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS students_deletions_ad AFTER DELETE ON students BEGIN
+        INSERT INTO student_deletions(deleted_id, student_id, deleted_at)
+        VALUES (old.id, old.student_id, CURRENT_TIMESTAMP);
+    END""",
+]
+
+
+# ===== FULL-TEXT SEARCH (SQLite FTS5) =====
+# Bảng ảo students_fts (rowid = students.id) chứa họ, tên, email, quê quán để tìm kiếm.
+# - Tokenizer unicode61 remove_diacritics 2: bỏ dấu tiếng Việt ("Nguyễn" khớp "nguyen")
+# - Chữ đ/Đ không phải là dấu nên được thay bằng d/D ngay trong trigger
+# Trigger trên bảng students giữ FTS luôn đồng bộ, kể cả khi ghi bằng Core (bulk insert, UPDATE ... RETURNING).
+SEARCH_TABLE = "students_fts"
+SEARCH_COLUMNS = ["first_name", "last_name", "email", "hometown"]
+
+def _fold_d(expr: str) -> str:
+    return f"replace(replace({expr}, 'đ', 'd'), 'Đ', 'D')"
+
+def _search_values(prefix: str) -> str:
+    return ", ".join(_fold_d(f"{prefix}.{column}") for column in SEARCH_COLUMNS)
+
+SEARCH_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        {", ".join(SEARCH_COLUMNS)},
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, {", ".join(SEARCH_COLUMNS)}) VALUES (new.id, {_search_values("new")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF {", ".join(SEARCH_COLUMNS)} ON students BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+        INSERT INTO {SEARCH_TABLE}(rowid, {", ".join(SEARCH_COLUMNS)}) VALUES (new.id, {_search_values("new")});
+    END""",
+]
+
+def _begin(bind):
+    """Engine -> mở transaction mới; Connection (vd: seed_direct) -> dùng transaction đang mở của caller"""
+    return bind.begin() if isinstance(bind, Engine) else nullcontext(bind)
+
+def create_search_index(bind):
+    """Tạo bảng FTS + trigger (idempotent) và nạp lại index nếu lệch với bảng students"""
+    with _begin(bind) as conn:
+        for ddl in SEARCH_INDEX_DDL:
+            conn.execute(text(ddl))
+        indexed = conn.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar()
+        total = conn.execute(text("SELECT count(*) FROM students")).scalar()
+        if indexed != total:
+            # DB có sẵn dữ liệu từ trước khi có FTS -> build lại toàn bộ index
+            conn.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+            conn.execute(text(
+                f"INSERT INTO {SEARCH_TABLE}(rowid, {', '.join(SEARCH_COLUMNS)}) "
+                f"SELECT s.id, {_search_values('s')} FROM students AS s"
+            ))
+
+def add_generated_columns(bind):
+    """
+    DB tạo trước khi có avg_score / rank: thêm generated column bằng ALTER TABLE.
+    SQLite chỉ cho ADD COLUMN dạng VIRTUAL (tính lúc đọc); giá trị vẫn được lưu trong index
+    nên truy vấn top-K vẫn đi trên index như bảng mới (STORED).
+    """
+    with _begin(bind) as conn:
+        existing = {row[1] for row in conn.execute(text("PRAGMA table_xinfo(students)"))}
+        if "avg_score" not in existing:
+            conn.execute(text(f"ALTER TABLE students ADD COLUMN avg_score FLOAT GENERATED ALWAYS AS ({AVG_SCORE_SQL}) VIRTUAL"))
+        if "rank" not in existing:
+            conn.execute(text(f"ALTER TABLE students ADD COLUMN rank VARCHAR(20) GENERATED ALWAYS AS ({RANK_SQL}) VIRTUAL"))
+
+def refresh_planner_stats(bind):
+    """
+    Cập nhật thống kê cho query planner (sqlite_stat1) khi chưa có, khi có index mới chưa được thống kê,
+    hoặc khi số dòng đã lệch > 2 lần so với lần ANALYZE trước. Không có thống kê, SQLite đoán độ chọn
+    lọc của index bằng hằng số và có thể đi dọc index sắp xếp thay vì SEARCH theo index của bộ lọc.
+    ANALYZE đầy đủ (~2s cho 1 triệu dòng) chỉ chạy lại khi thống kê đã cũ.
+    """
+    with _begin(bind) as conn:
+        rows = conn.execute(text("SELECT count(*) FROM students")).scalar()
+        if rows == 0:
+            return  # bảng rỗng: sqlite_stat1 không ghi gì, để lần khởi động sau (đã có dữ liệu) ANALYZE
+        indexes = set(conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'students' AND sql IS NOT NULL"
+        )).scalars())
+        stats = {}
+        if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).first():
+            stats = dict(conn.execute(text(
+                "SELECT idx, stat FROM sqlite_stat1 WHERE tbl = 'students' AND idx IS NOT NULL"
+            )).all())
+        analyzed_rows = max((int(stat.split()[0]) for stat in stats.values()), default=0)
+        if indexes <= stats.keys() and analyzed_rows / 2 <= rows <= analyzed_rows * 2:
+            return
+        conn.execute(text("ANALYZE students"))
+
+def init_db(bind):
+    """Tạo bảng (nếu chưa có) và các cấu trúc phụ trợ: cột tính toán, index, nhật ký xóa, FTS index"""
+    Base.metadata.create_all(bind=bind)
+    add_generated_columns(bind)
+    # create_all bỏ qua bảng đã tồn tại -> tạo bổ sung index mới khai báo cho DB cũ
+    for index in Student.__table__.indexes:
+        index.create(bind=bind, checkfirst=True)
+    with _begin(bind) as conn:
+        for ddl in CHANGE_LOG_DDL:
+            conn.execute(text(ddl))
+    create_search_index(bind)
+    refresh_planner_stats(bind)
@@ -0,0 +1,69 @@
+import base64
+import json
+from typing import NamedTuple, Optional
+
+# ===== CURSOR PAGINATION =====
+# Cursor là chuỗi "opaque" với client: thực chất là JSON chứa khóa sắp xếp của
+# bản ghi cuối trang trước, được mã hóa base64 (urlsafe) để đặt vào query string.
+# Nhờ đó trang tiếp theo được lấy bằng "WHERE student_id > :last" trên index
+# thay vì OFFSET (SQLite phải duyệt lại toàn bộ các dòng bị bỏ qua).
+# Khi sắp xếp theo cột điểm, cursor chứa thêm giá trị điểm của dòng cuối
+# (khóa sắp xếp là cặp (điểm, student_id)).
+
+class Cursor(NamedTuple):
+    student_code: str                           # mã SV của dòng cuối trang trước
+    sort_by: str = "student_id"                 # cột sắp xếp lúc tạo cursor
+    sort_value: Optional[float] = None          # giá trị cột sắp xếp của dòng cuối
+
+def encode_cursor(last_student_code: str, sort_by: str = "student_id", sort_value=None) -> str:
+    """Mã hóa khóa sắp xếp của dòng cuối trang thành cursor"""
+    data = {"sid": last_student_code}
+    if sort_by != "student_id":
+        data.update(s=sort_by, v=sort_value)
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Giải mã cursor về khóa sắp xếp của dòng cuối trang trước.
+    Raise ValueError nếu cursor bị sửa/hỏng.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        decoded = Cursor(data["sid"], data.get("s", "student_id"), data.get("v"))
+    except Exception as e:
+        raise ValueError("Cursor khong hop le") from e
+    if not isinstance(decoded.student_code, str) or not isinstance(decoded.sort_by, str):
+        raise ValueError("Cursor khong hop le")
+    if decoded.sort_value is not None and not isinstance(decoded.sort_value, (int, float)):
+        raise ValueError("Cursor khong hop le")
+    return decoded
+
+# ===== CURSOR CHO CHANGE FEED =====
+# Vị trí đọc của change feed: mốc updated_at (t) + id dòng cuối cùng cùng mốc đó (id)
+# và seq của tombstone cuối cùng đã đọc (seq).
+
+class ChangeCursor(NamedTuple):
+    since: Optional[str]                        # 'YYYY-MM-DD HH:MM:SS' (UTC), None = từ đầu
+    after_id: Optional[int] = None              # id dòng cuối cùng cùng mốc since
+    after_seq: Optional[int] = None             # seq tombstone cuối cùng đã đọc
+
+def encode_change_cursor(since: Optional[str], after_id: Optional[int] = None, after_seq: Optional[int] = None) -> str:
+    raw = json.dumps({"t": since, "id": after_id, "seq": after_seq}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_change_cursor(cursor: str) -> ChangeCursor:
+    """Raise ValueError nếu cursor bị sửa/hỏng"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        decoded = ChangeCursor(data.get("t"), data.get("id"), data.get("seq"))
+    except Exception as e:
+        raise ValueError("Cursor khong hop le") from e
+    if decoded.since is not None and not isinstance(decoded.since, str):
+        raise ValueError("Cursor khong hop le")
+    for value in (decoded.after_id, decoded.after_seq):
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            raise ValueError("Cursor khong hop le")
+    return decoded
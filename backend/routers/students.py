@@ -1,78 +1,561 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Literal, Optional
+from urllib.parse import urlencode
 
 # Import các module local
-import database, schemas, crud, models 
+import database, schemas, crud, models, pagination, streaming, export
+from cache import CachedResponse, etag_matches, response_cache
 
 router = APIRouter(
     prefix="/students",
     tags=["students"]
 )
 
-# Dependency
-get_db = database.get_db
+# Dependency (Session hoặc AsyncSession tùy STUDENT_DB_MODE)
+get_db = database.get_session
+run_db = database.run_db
+
+# Số dòng mặc định cho 1 trang danh sách (JSON thường)
+DEFAULT_PAGE_SIZE = 1000
+
+# Số kết quả tối đa cho 1 trang tìm kiếm
+MAX_SEARCH_SIZE = 100
+
+# Số dòng tối đa cho 1 bảng xếp hạng
+MAX_TOP_SIZE = 100
+
+# Số thay đổi tối đa cho 1 trang change feed
+MAX_CHANGES_SIZE = 1000
+
+# Số dòng tối đa cho 1 request bulk
+MAX_BULK_SIZE = 5000
+
+# Serializer cho danh sách (dùng khi tự tạo body JSON để cache)
+STUDENT_LIST = TypeAdapter(List[schemas.StudentResponse])
+
+def _cache_key(request: Request) -> str:
+    """Key cache = path + query string đã sắp xếp (thứ tự tham số không ảnh hưởng)"""
+    return request.url.path + "?" + urlencode(sorted(request.query_params.multi_items()))
+
+def _cached_json_response(request: Request, cached: CachedResponse, media_type: str = "application/json") -> Response:
+    """Trả 304 nếu client đã có bản trùng ETag, ngược lại trả body (mặc định JSON) kèm ETag"""
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": "no-cache",  # trình duyệt luôn hỏi lại server kèm If-None-Match
+        **cached.headers,
+    }
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cached.body, media_type=media_type, headers=headers)
+
+def student_filters(
+    hometown: Optional[str] = None,
+    math_min: Optional[float] = Query(None, ge=0, le=10),
+    math_max: Optional[float] = Query(None, ge=0, le=10),
+    literature_min: Optional[float] = Query(None, ge=0, le=10),
+    literature_max: Optional[float] = Query(None, ge=0, le=10),
+    english_min: Optional[float] = Query(None, ge=0, le=10),
+    english_max: Optional[float] = Query(None, ge=0, le=10),
+    birth_date_from: Optional[date] = None,
+    birth_date_to: Optional[date] = None,
+) -> schemas.StudentFilter:
+    """Dependency: gom các query param lọc thành StudentFilter"""
+    return schemas.StudentFilter(
+        hometown=hometown,
+        math_min=math_min,
+        math_max=math_max,
+        literature_min=literature_min,
+        literature_max=literature_max,
+        english_min=english_min,
+        english_max=english_max,
+        birth_date_from=birth_date_from,
+        birth_date_to=birth_date_to,
+    )
 
 @router.get("/", response_model=List[schemas.StudentResponse])
-def read_students(skip: int = 0, limit: int = 1000, db: Session = Depends(get_db)):
-    students = crud.get_all_students(db, skip=skip, limit=limit)
-    return students
+async def read_students(
+    request: Request,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort_by: Literal["student_id", "math", "literature", "english"] = "student_id",
+    order: Literal["asc", "desc"] = "asc",
+    filters: schemas.StudentFilter = Depends(student_filters),
+    output_format: Optional[str] = Query(None, alias="format", description="ndjson: stream từng dòng"),
+    fields: Optional[str] = Query(None, description="Chỉ lấy các cột này, vd: student_id,first_name,math"),
+    with_total: bool = Query(False, description="true: trả thêm header X-Total-Count (số SV khớp bộ lọc)"),
+    db: Session = Depends(get_db)
+):
+    try:
+        field_names = streaming.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Định dạng response theo header Accept: JSON thường / JSON dạng cột / MessagePack (dạng cột)
+    accept = request.headers.get("accept", "")
+    if streaming.MSGPACK_MEDIA_TYPE in accept or "application/x-msgpack" in accept:
+        media_type = streaming.MSGPACK_MEDIA_TYPE
+        if streaming.msgpack is None:
+            raise HTTPException(status_code=501, detail="Can cai msgpack de tra ve MessagePack")
+    elif streaming.COLUMNAR_MEDIA_TYPE in accept:
+        media_type = streaming.COLUMNAR_MEDIA_TYPE
+    else:
+        media_type = "application/json"
+
+    # Có cursor -> keyset pagination; không có -> giữ skip/limit cho client cũ
+    after = None
+    if cursor is not None:
+        try:
+            after = pagination.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor khong hop le")
+        if after.sort_by != sort_by:
+            raise HTTPException(status_code=400, detail="Cursor khong khop voi sort_by")
+    descending = order == "desc"
+
+    # Chế độ stream NDJSON (?format=ndjson hoặc Accept: application/x-ndjson):
+    # không giới hạn mặc định, bộ nhớ không tăng theo số dòng
+    if output_format == "ndjson" or streaming.NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        batches = streaming.iter_student_batches(
+            filters=filters, sort_by=sort_by, descending=descending, after=after, skip=skip, limit=limit,
+            fields=field_names
+        )
+        return StreamingResponse(streaming.ndjson_lines(batches), media_type=streaming.NDJSON_MEDIA_TYPE)
+
+    # Cache theo URL + định dạng: trùng request -> trả body đã serialize (hoặc 304 nếu ETag khớp)
+    cache_key = _cache_key(request) + "|" + media_type
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        generation = response_cache.generation
+        if limit is None:
+            limit = DEFAULT_PAGE_SIZE
+
+        if field_names is None and media_type == "application/json":
+            # JSON đầy đủ cột: giữ nguyên đường đi qua ORM + StudentResponse
+            students = await run_db(
+                db, crud.get_students,
+                filters=filters, sort_by=sort_by, descending=descending, after=after, skip=skip, limit=limit
+            )
+            last = (students[-1].student_id, getattr(students[-1], sort_by)) if students else None
+            body = STUDENT_LIST.dump_json(STUDENT_LIST.validate_python(students, from_attributes=True))
+        else:
+            # Projection / dạng cột / MessagePack: SELECT đúng các cột cần, encode thẳng tuple từ SQLite.
+            # Luôn lấy thêm student_id + cột sắp xếp để tạo cursor trang sau (không trả về nếu không yêu cầu)
+            output = field_names or list(streaming.RAW_COLUMNS)
+            names = list(dict.fromkeys(output + ["student_id", sort_by]))
+            rows = await run_db(
+                db, crud.get_students,
+                filters=filters, sort_by=sort_by, descending=descending, after=after, skip=skip, limit=limit,
+                columns=[streaming.RAW_COLUMNS[name] for name in names]
+            )
+            last = (rows[-1][names.index("student_id")], rows[-1][names.index(sort_by)]) if rows else None
+            if media_type == streaming.MSGPACK_MEDIA_TYPE:
+                body = streaming.msgpack.packb(streaming.to_columnar(names, rows, output))
+            elif media_type == streaming.COLUMNAR_MEDIA_TYPE:
+                body = streaming.dumps(streaming.to_columnar(names, rows, output))
+            else:
+                body = streaming.dumps(streaming.to_rows(names, rows, output))
+            students = rows
+
+        # Trang đầy -> có thể còn trang sau: trả cursor qua header X-Next-Cursor và Link
+        headers = {"Vary": "Accept"}
+        if students and len(students) == limit:
+            next_cursor = pagination.encode_cursor(last[0], sort_by, last[1])
+            next_url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+            headers["X-Next-Cursor"] = next_cursor
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        if with_total:
+            headers["X-Total-Count"] = str(await run_db(db, crud.count_students, filters=filters))
+        cached = response_cache.set(cache_key, body, generation, headers)
+    return _cached_json_response(request, cached, media_type)
+
+@router.get("/stats", response_model=schemas.StudentStats)
+async def read_student_stats(request: Request, db: Session = Depends(get_db)):
+    """Thống kê tổng hợp (điểm TB, xếp loại, theo quê quán, theo tháng sinh) tính bằng SQL"""
+    cache_key = _cache_key(request)
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        generation = response_cache.generation
+        stats = await run_db(db, crud.get_student_stats)
+        body = schemas.StudentStats.model_validate(stats).model_dump_json().encode("utf-8")
+        cached = response_cache.set(cache_key, body, generation)
+    return _cached_json_response(request, cached)
+
+@router.get("/top", response_model=List[schemas.StudentResponse])
+async def read_top_students(
+    request: Request,
+    n: int = Query(10, ge=1, le=MAX_TOP_SIZE, description="Số sinh viên"),
+    hometown: Optional[str] = Query(None, description="Chỉ xếp hạng trong 1 quê quán"),
+    db: Session = Depends(get_db)
+):
+    """Bảng xếp hạng theo điểm trung bình (toàn trường hoặc theo quê quán)"""
+    cache_key = _cache_key(request)
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        generation = response_cache.generation
+        students = await run_db(db, crud.get_top_students, n=n, hometown=hometown)
+        body = STUDENT_LIST.dump_json(STUDENT_LIST.validate_python(students, from_attributes=True))
+        cached = response_cache.set(cache_key, body, generation)
+    return _cached_json_response(request, cached)
+
+@router.get("/search", response_model=List[schemas.StudentResponse])
+async def search_students(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Từ khóa: họ tên, email, quê quán (không phân biệt dấu, khớp tiền tố)"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_SIZE),
+    db: Session = Depends(get_db)
+):
+    match_query = crud.make_match_query(q)
+    if match_query is None:
+        raise HTTPException(status_code=400, detail="Tu khoa tim kiem khong hop le")
+
+    cache_key = _cache_key(request)
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        generation = response_cache.generation
+        students = await run_db(db, crud.search_students, match_query=match_query, skip=skip, limit=limit)
+        body = STUDENT_LIST.dump_json(STUDENT_LIST.validate_python(students, from_attributes=True))
+        cached = response_cache.set(cache_key, body, generation)
+    return _cached_json_response(request, cached)
+
+@router.get("/export")
+async def export_students(
+    export_format: Literal["csv", "parquet", "arrow"] = Query("csv", alias="format"),
+    filters: schemas.StudentFilter = Depends(student_filters)
+):
+    """
+    Xuất toàn bộ (hoặc theo bộ lọc) danh sách sinh viên dạng CSV / Parquet / Arrow IPC.
+    Dữ liệu được stream theo lô từ server-side cursor nên bộ nhớ không tăng theo số dòng.
+    """
+    if export_format != "csv" and export.pa is None:
+        raise HTTPException(status_code=501, detail=f"Can cai pyarrow de xuat dinh dang {export_format}")
+    media_type, extension = export.EXPORT_FORMATS[export_format]
+    filename = f"students_{datetime.now().strftime('%Y%m%d%H%M')}.{extension}"
+    return StreamingResponse(
+        export.export_chunks(export_format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/changes", response_model=schemas.ChangeFeed)
+async def read_student_changes(
+    since: Optional[datetime] = Query(None, description="Lấy thay đổi từ thời điểm này (ISO 8601, mặc định UTC)"),
+    cursor: Optional[str] = Query(None, description="next_cursor của lần gọi trước"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_CHANGES_SIZE),
+    db: Session = Depends(get_db)
+):
+    """
+    Change feed cho đồng bộ tăng dần: các SV được tạo/sửa (upserts) và bị xóa (deletes)
+    kể từ `since` hoặc từ `cursor`. Client áp dụng deletes trước rồi upserts, lưu lại
+    next_cursor và gọi tiếp (ngay nếu has_more, định kỳ nếu không).
+    Không cache: kết quả phụ thuộc thời điểm gọi.
+    """
+    if cursor is not None:
+        try:
+            position = pagination.decode_change_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor khong hop le")
+    else:
+        if since is not None:
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc)
+            since = since.strftime("%Y-%m-%d %H:%M:%S")  # cùng định dạng CURRENT_TIMESTAMP của SQLite
+        position = pagination.ChangeCursor(since)
+
+    changes = await run_db(
+        db, crud.get_changes,
+        since=position.since, after_id=position.after_id, after_seq=position.after_seq, limit=limit
+    )
+    upserts = [
+        schemas.StudentChange(**schemas.StudentResponse.model_validate(db_student).model_dump(), updated_at=updated_at)
+        for db_student, updated_at in changes["upserts"]
+    ]
+    return schemas.ChangeFeed(
+        upserts=upserts,
+        deletes=changes["deletes"],
+        next_cursor=pagination.encode_change_cursor(
+            changes["next_since"], changes["next_after_id"], changes["next_seq"]
+        ),
+        has_more=changes["has_more"]
+    )
 
 @router.get("/{student_id}", response_model=schemas.StudentResponse)
-def read_student(student_id: int, db: Session = Depends(get_db)):
-    db_student = crud.get_student(db, student_id=student_id)
-    if db_student is None:
-        raise HTTPException(status_code=404, detail=f"Sinh vien co ID {student_id} khong ton tai")
-    return db_student
+async def read_student(student_id: int, request: Request, db: Session = Depends(get_db)):
+    cache_key = _cache_key(request)
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        generation = response_cache.generation
+        db_student = await run_db(db, crud.get_student, student_id=student_id)
+        if db_student is None:
+            raise HTTPException(status_code=404, detail=f"Sinh vien co ID {student_id} khong ton tai")
+        body = schemas.StudentResponse.model_validate(db_student).model_dump_json().encode("utf-8")
+        cached = response_cache.set(cache_key, body, generation)
+    return _cached_json_response(request, cached)
+
+async def _raise_if_duplicate(e: IntegrityError, db, code_detail: str, email_detail: str, codes=()):
+    """
+    Map lỗi UNIQUE của SQLite (trùng mã SV / email) sang lỗi 400 tương ứng.
+    SQLite chỉ báo index UNIQUE đầu tiên bị vi phạm (index email được kiểm tra trước) -> khi báo trùng email
+    thì tra thêm mã SV đang ghi (`codes`: các cặp (ID SV hoặc None khi tạo mới, mã SV)), trùng cả hai
+    vẫn báo lỗi mã SV trước như khi còn SELECT kiểm tra trước.
+    """
+    message = str(e.orig)
+    if "students.student_id" in message:
+        raise HTTPException(status_code=400, detail=code_detail)
+    if "students.email" in message:
+        if await run_db(db, crud.student_codes_taken, list(codes)):
+            raise HTTPException(status_code=400, detail=code_detail)
+        raise HTTPException(status_code=400, detail=email_detail)
 
 @router.post("/", response_model=schemas.StudentResponse, status_code=status.HTTP_201_CREATED)
-def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)):
-    # 1. Check trùng Mã SV
-    if crud.get_student_by_student_code(db, student_code=student.student_id):
-        raise HTTPException(status_code=400, detail=f"Ma sinh vien '{student.student_id}' da ton tai.")
-    
-    # 2. Check trùng Email
-    if crud.get_student_by_email(db, email=student.email):
-        raise HTTPException(status_code=400, detail=f"Email '{student.email}' da duoc dang ky.")
-    
+async def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)):
+    # Không SELECT kiểm tra trước: UNIQUE index trên student_id/email chặn trùng ngay lúc INSERT
+    # (1 round-trip, không bị race giữa lúc check và lúc ghi)
     try:
-        return crud.create_student(db=db, student=student)
+        created = await run_db(db, crud.create_student, student=student)
+    except IntegrityError as e:
+        await _raise_if_duplicate(
+            e, db,
+            code_detail=f"Ma sinh vien '{student.student_id}' da ton tai.",
+            email_detail=f"Email '{student.email}' da duoc dang ky.",
+            codes=[(None, student.student_id)]
+        )
+        raise HTTPException(status_code=500, detail=f"Loi he thong: {str(e)}")
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Loi he thong: {str(e)}")
+    response_cache.invalidate()
+    return created
 
-@router.put("/{student_id}", response_model=schemas.StudentResponse)
-def update_student(student_id: int, student: schemas.StudentCreate, db: Session = Depends(get_db)):
-    # 1. Tìm sinh viên cần sửa
-    db_student = crud.get_student(db, student_id=student_id)
-    if not db_student:
-        raise HTTPException(status_code=404, detail="Sinh vien khong ton tai")
+@router.post("/bulk", response_model=schemas.BulkCreateResponse)
+async def create_students_bulk(payload: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    Tạo nhiều sinh viên trong 1 request / 1 transaction.
+    Dòng lỗi (sai format, trùng mã SV/email) không chặn các dòng hợp lệ;
+    kết quả trả về theo đúng thứ tự (index) của lô gửi lên.
+    """
+    if len(payload) > MAX_BULK_SIZE:
+        raise HTTPException(status_code=400, detail=f"Toi da {MAX_BULK_SIZE} sinh vien moi lan")
+
+    results: List[Optional[schemas.BulkRowResult]] = [None] * len(payload)
+
+    # 1. Validate từng dòng, gắn lỗi theo index
+    valid_rows = []
+    for index, row in enumerate(payload):
+        try:
+            valid_rows.append((index, schemas.StudentCreate.model_validate(row)))
+        except ValidationError as e:
+            # Trả lại mã SV client gửi (kể cả sai kiểu, vd số) dạng chuỗi để BulkRowResult không lỗi theo
+            code = row.get("student_id")
+            results[index] = schemas.BulkRowResult(
+                index=index,
+                success=False,
+                student_id=str(code) if code is not None else None,
+                errors=schemas.format_validation_errors(e.errors())
+            )
+
+    # 2. Check trùng với DB bằng set-based query (thay vì 2 SELECT cho mỗi dòng)
+    existing_codes = await run_db(db, crud.get_existing_student_codes, [s.student_id for _, s in valid_rows])
+    existing_emails = await run_db(db, crud.get_existing_emails, [s.email for _, s in valid_rows])
 
-    # 2. Check trùng Mã SV (nếu mã thay đổi và trùng với người khác)
-    existing_code = crud.get_student_by_student_code(db, student_code=student.student_id)
-    if existing_code and existing_code.id != student_id:
-        raise HTTPException(status_code=400, detail=f"Ma sinh vien '{student.student_id}' da duoc su dung.")
+    # 3. Check trùng trong chính lô dữ liệu (dòng xuất hiện trước được giữ)
+    seen_codes, seen_emails = set(), set()
+    to_insert = []
+    for index, student in valid_rows:
+        errors = {}
+        if student.student_id in existing_codes:
+            errors["student_id"] = f"Ma sinh vien '{student.student_id}' da ton tai."
+        elif student.student_id in seen_codes:
+            errors["student_id"] = f"Ma sinh vien '{student.student_id}' bi trung trong lo du lieu."
+        if student.email in existing_emails:
+            errors["email"] = f"Email '{student.email}' da duoc dang ky."
+        elif student.email in seen_emails:
+            errors["email"] = f"Email '{student.email}' bi trung trong lo du lieu."
 
-    # 3. Check trùng Email
-    existing_email = crud.get_student_by_email(db, email=student.email)
-    if existing_email and existing_email.id != student_id:
-        raise HTTPException(status_code=400, detail=f"Email '{student.email}' da duoc dang ky boi SV khac.")
+        if errors:
+            results[index] = schemas.BulkRowResult(
+                index=index, success=False, student_id=student.student_id, errors=errors
+            )
+            continue
+        seen_codes.add(student.student_id)
+        seen_emails.add(student.email)
+        to_insert.append((index, student))
 
+    # 4. Insert toàn bộ dòng hợp lệ trong 1 transaction
     try:
-        return crud.update_student(db=db, db_student=db_student, student_update=student)
+        created_ids = await run_db(db, crud.create_students_bulk, [student for _, student in to_insert])
     except Exception as e:
-        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Loi he thong: {str(e)}")
+    if to_insert:
+        response_cache.invalidate()
+
+    for index, student in to_insert:
+        results[index] = schemas.BulkRowResult(
+            index=index, success=True, id=created_ids.get(student.student_id), student_id=student.student_id
+        )
+
+    return schemas.BulkCreateResponse(
+        total=len(payload),
+        created=len(to_insert),
+        failed=len(payload) - len(to_insert),
+        results=results
+    )
+
+@router.patch("/bulk", response_model=schemas.BulkUpdateResponse)
+async def update_students_bulk(payload: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+    """
+    Sửa nhiều sinh viên trong 1 request / 1 transaction: mỗi phần tử là {"id": ..., "fields": {...}},
+    chỉ các trường trong `fields` được ghi. Dòng lỗi (sai format, ID không tồn tại) không chặn
+    các dòng hợp lệ; trùng mã SV/email với SV khác -> hủy cả lô (400).
+    """
+    if len(payload) > MAX_BULK_SIZE:
+        raise HTTPException(status_code=400, detail=f"Toi da {MAX_BULK_SIZE} sinh vien moi lan")
+
+    results: List[Optional[schemas.BulkRowResult]] = [None] * len(payload)
+
+    # 1. Validate từng dòng, gắn lỗi theo index
+    valid_rows = []
+    seen_ids = set()
+    for index, row in enumerate(payload):
+        try:
+            item = schemas.StudentPatchItem.model_validate(row)
+        except ValidationError as e:
+            # id sai kiểu (vd "abc") không đưa vào BulkRowResult.id (int) - lý do đã nằm trong errors
+            row_id = row.get("id")
+            results[index] = schemas.BulkRowResult(
+                index=index, success=False, id=row_id if isinstance(row_id, int) else None,
+                errors=schemas.format_validation_errors(e.errors())
+            )
+            continue
+        errors = {}
+        if not item.fields.model_fields_set:
+            errors["fields"] = "Khong co truong nao de cap nhat"
+        elif item.id in seen_ids:
+            errors["id"] = f"ID {item.id} bi trung trong lo du lieu"
+        if errors:
+            results[index] = schemas.BulkRowResult(index=index, success=False, id=item.id, errors=errors)
+            continue
+        seen_ids.add(item.id)
+        valid_rows.append((index, item))
+
+    # 2. Check ID tồn tại bằng set-based query
+    existing_ids = await run_db(db, crud.get_existing_ids, [item.id for _, item in valid_rows])
+    to_update = []
+    for index, item in valid_rows:
+        if item.id not in existing_ids:
+            results[index] = schemas.BulkRowResult(
+                index=index, success=False, id=item.id, errors={"id": f"Sinh vien co ID {item.id} khong ton tai"}
+            )
+        else:
+            to_update.append((index, item))
+
+    # 3. Ghi toàn bộ dòng hợp lệ trong 1 transaction
+    try:
+        await run_db(db, crud.update_students_bulk, [(item.id, item.fields) for _, item in to_update])
+    except IntegrityError as e:
+        await _raise_if_duplicate(
+            e, db,
+            code_detail="Ma sinh vien da duoc su dung boi SV khac, khong cap nhat dong nao.",
+            email_detail="Email da duoc dang ky boi SV khac, khong cap nhat dong nao.",
+            codes=[(item.id, item.fields.student_id) for _, item in to_update]
+        )
+        raise HTTPException(status_code=500, detail=f"Loi update: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Loi update: {str(e)}")
+    if to_update:
+        response_cache.invalidate()
+
+    for index, item in to_update:
+        results[index] = schemas.BulkRowResult(
+            index=index, success=True, id=item.id, student_id=item.fields.student_id
+        )
+
+    return schemas.BulkUpdateResponse(
+        total=len(payload),
+        updated=len(to_update),
+        failed=len(payload) - len(to_update),
+        results=results
+    )
+
+@router.post("/bulk-delete", response_model=schemas.BulkDeleteResponse)
+async def delete_students_bulk(request: schemas.BulkDeleteRequest, db: Session = Depends(get_db)):
+    """
+    Xóa hàng loạt bằng 1 câu DELETE: theo danh sách `ids` và/hoặc `filter` (cùng điều kiện
+    lọc như GET /students/). Bắt buộc có ít nhất 1 điều kiện để tránh xóa nhầm cả bảng.
+    """
+    has_filter = request.filter is not None and bool(request.filter.model_dump(exclude_none=True))
+    if request.ids is None and not has_filter:
+        raise HTTPException(status_code=400, detail="Can truyen ids hoac it nhat 1 dieu kien loc")
+    if request.ids is not None and len(request.ids) > MAX_BULK_SIZE:
+        raise HTTPException(status_code=400, detail=f"Toi da {MAX_BULK_SIZE} ID moi lan")
+
+    try:
+        deleted = await run_db(db, crud.delete_students, ids=request.ids, filters=request.filter)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Loi khi xoa: {str(e)}")
+    if deleted:
+        response_cache.invalidate()
+    return schemas.BulkDeleteResponse(deleted=deleted)
+
+@router.put("/{student_id}", response_model=schemas.StudentResponse)
+async def update_student(student_id: int, student: schemas.StudentCreate, db: Session = Depends(get_db)):
+    # UPDATE ... RETURNING: không có dòng trả về -> SV không tồn tại;
+    # trùng mã SV/email với SV khác -> UNIQUE index báo IntegrityError
+    try:
+        updated = await run_db(db, crud.update_student, student_id=student_id, student_update=student)
+    except IntegrityError as e:
+        await _raise_if_duplicate(
+            e, db,
+            code_detail=f"Ma sinh vien '{student.student_id}' da duoc su dung.",
+            email_detail=f"Email '{student.email}' da duoc dang ky boi SV khac.",
+            codes=[(student_id, student.student_id)]
+        )
+        raise HTTPException(status_code=500, detail=f"Loi update: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Loi update: {str(e)}")
+
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Sinh vien khong ton tai")
+    response_cache.invalidate()
+    return updated
+
+@router.patch("/{student_id}", response_model=schemas.StudentResponse)
+async def patch_student(student_id: int, student: schemas.StudentPatch, db: Session = Depends(get_db)):
+    # Chỉ validate + ghi các trường được gửi lên (vd: {"math": 9}) bằng 1 câu UPDATE ... RETURNING
+    if not student.model_fields_set:
+        raise HTTPException(status_code=400, detail="Khong co truong nao de cap nhat")
+    try:
+        updated = await run_db(db, crud.patch_student, student_id=student_id, patch=student)
+    except IntegrityError as e:
+        await _raise_if_duplicate(
+            e, db,
+            code_detail=f"Ma sinh vien '{student.student_id}' da duoc su dung.",
+            email_detail=f"Email '{student.email}' da duoc dang ky boi SV khac.",
+            codes=[(student_id, student.student_id)]
+        )
         raise HTTPException(status_code=500, detail=f"Loi update: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Loi update: {str(e)}")
+
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Sinh vien khong ton tai")
+    response_cache.invalidate()
+    return updated
 
 @router.delete("/{student_id}")
-def delete_student(student_id: int, db: Session = Depends(get_db)):
-    db_student = crud.get_student(db, student_id=student_id)
+async def delete_student(student_id: int, db: Session = Depends(get_db)):
+    db_student = await run_db(db, crud.get_student, student_id=student_id)
     if not db_student:
         raise HTTPException(status_code=404, detail="Sinh vien khong ton tai")
     
     try:
-        crud.delete_student(db=db, db_student=db_student)
+        await run_db(db, crud.delete_student, db_student=db_student)
+        response_cache.invalidate()
         return {"message": "Xoa sinh vien thanh cong"}
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Loi khi xoa: {str(e)}")
\ No newline at end of file
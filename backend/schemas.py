@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional
-from datetime import datetime
+from typing import Dict, List, Optional
+from datetime import date, datetime
 import re
 
 # --- Base Schema (Dùng chung cho Input) ---
@@ -106,7 +106,27 @@ class StudentCreate(StudentBase):
             }
         }
 
-# --- Schema cho Response (Trả về Client) ---
+# --- Schema cho Input khi Cập nhật một phần (PATCH) ---
+class StudentPatch(StudentCreate):
+    """
+    Mọi trường đều tùy chọn: chỉ trường được gửi lên mới được validate và ghi xuống DB.
+    Trường bắt buộc (họ tên, email, ...) không nhận null; điểm gửi null = xóa điểm.
+    """
+    student_id: str = None
+    first_name: str = None
+    last_name: str = None
+    email: EmailStr = None
+    birth_date: str = None
+    hometown: str = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "math": 9.0
+            }
+        }
+
+
 class StudentResponse(BaseModel): 
     id: int
     student_id: str
@@ -118,6 +138,8 @@ class StudentResponse(BaseModel):
     math: Optional[float] = None
     literature: Optional[float] = None
     english: Optional[float] = None
+    avg_score: Optional[float] = None   # điểm TB 3 môn (DB tự tính)
+    rank: Optional[str] = None          # xếp loại: Giỏi / Khá / Trung Bình / Yếu / N/A
 
     @field_validator('birth_date', mode='before')
     def parse_birth_date(cls, v):
@@ -127,4 +149,118 @@ class StudentResponse(BaseModel):
         return str(v)
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- Bộ lọc danh sách sinh viên ---
+class StudentFilter(BaseModel):
+    hometown: Optional[str] = None
+    math_min: Optional[float] = None
+    math_max: Optional[float] = None
+    literature_min: Optional[float] = None
+    literature_max: Optional[float] = None
+    english_min: Optional[float] = None
+    english_max: Optional[float] = None
+    birth_date_from: Optional[date] = None
+    birth_date_to: Optional[date] = None
+
+# --- Schema cho Bulk Create ---
+class BulkRowResult(BaseModel):
+    index: int                              # vị trí dòng trong lô gửi lên
+    success: bool
+    id: Optional[int] = None                # ID Database nếu tạo thành công
+    student_id: Optional[str] = None
+    errors: Optional[Dict[str, str]] = None # {field: message} nếu thất bại
+
+# --- Schema cho Bulk Update / Bulk Delete ---
+class StudentPatchItem(BaseModel):
+    id: int                                 # ID Database của SV cần sửa
+    fields: StudentPatch                    # chỉ các trường cần sửa
+
+class BulkUpdateResponse(BaseModel):
+    total: int
+    updated: int
+    failed: int
+    results: List[BulkRowResult]
+
+class BulkDeleteRequest(BaseModel):
+    ids: Optional[List[int]] = None         # xóa theo danh sách ID Database
+    filter: Optional[StudentFilter] = None  # hoặc/và theo điều kiện lọc (giống GET /students/)
+
+class BulkDeleteResponse(BaseModel):
+    deleted: int
+
+class BulkCreateResponse(BaseModel):
+    total: int
+    created: int
+    failed: int
+    results: List[BulkRowResult]
+
+# --- Schema cho Change Feed ---
+class StudentChange(StudentResponse):
+    updated_at: Optional[str] = None    # 'YYYY-MM-DD HH:MM:SS' (UTC)
+
+class StudentTombstone(BaseModel):
+    seq: int
+    id: int                             # ID Database của SV đã bị xóa
+    student_id: str
+    deleted_at: str
+
+class ChangeFeed(BaseModel):
+    upserts: List[StudentChange]        # dòng được tạo/sửa, theo thứ tự (updated_at, id)
+    deletes: List[StudentTombstone]     # dòng đã bị xóa, theo thứ tự seq
+    next_cursor: str                    # truyền lại ở lần gọi sau (?cursor=)
+    has_more: bool                      # True -> gọi tiếp ngay với next_cursor
+
+# --- Schema cho Thống kê ---
+class SubjectStats(BaseModel):
+    count: int                      # số SV có điểm môn này
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+class HometownStats(BaseModel):
+    hometown: str
+    count: int
+    avg_score: Optional[float] = None
+    math: Optional[float] = None
+    literature: Optional[float] = None
+    english: Optional[float] = None
+
+class BirthMonthStats(BaseModel):
+    month: int
+    count: int
+    avg_score: Optional[float] = None
+
+class StudentStats(BaseModel):
+    count: int
+    avg_score: Optional[float] = None   # TB của điểm TB 3 môn
+    subjects: Dict[str, SubjectStats]
+    ranks: Dict[str, int]               # Giỏi / Khá / Trung Bình / Yếu / N/A
+    hometowns: List[HometownStats]
+    birth_months: List[BirthMonthStats]
+
+# --- Chuyển lỗi validate của Pydantic sang message tiếng Việt ---
+def format_validation_errors(errors: list) -> Dict[str, str]:
+    """
+    Gom danh sách lỗi của Pydantic thành {field: message}.
+    Dùng chung cho error handler 422 và bulk create (lỗi theo từng dòng).
+    """
+    result = {}
+    for error in errors:
+        # Xử lý an toàn trường hợp không có loc
+        field = str(error['loc'][-1]) if error['loc'] else 'unknown'
+        message = error['msg']
+
+        if 'at least 1 character' in message:
+            result[field] = f'{field} khong duoc de trong'
+        elif 'ensure this value has at most' in message:
+            result[field] = f'{field} vuot qua so ky tu toi da'
+        elif 'value is not a valid email address' in message:
+            result[field] = 'Email khong hop le (vi du: abc@example.com)'
+        elif error.get('type') == 'string_type' and error.get('input') is None:
+            result[field] = f'{field} khong duoc de trong'  # PATCH gửi null cho trường bắt buộc
+        elif 'type_error' in message:
+            result[field] = f'{field} co kieu du lieu khong chinh xac'
+        else:
+            result[field] = message
+    return result
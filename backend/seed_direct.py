@@ -0,0 +1,141 @@
+import sqlite3
+import time
+from typing import Iterator, List, Sequence
+
+import numpy as np
+from sqlalchemy import text
+
+import database, models
+
+# ===== SEED TRỰC TIẾP VÀO SQLITE (NumPy) =====
+# Sinh dữ liệu theo cột bằng NumPy (cùng phân phối với get_dirty_but_valid_payload trong
+# generate_via_api.py) rồi ghi thẳng vào SQLite bằng executemany theo lô lớn, tất cả trong
+# 1 transaction. Cùng seed -> cùng dữ liệu.
+#
+# Chi phí chính khi nạp hàng triệu dòng là cập nhật index + trigger FTS / nhật ký xóa cho
+# TỪNG dòng. Vì vậy trong transaction: bỏ index phụ và trigger, insert, rồi tạo lại bằng
+# models.init_db (build index 1 lần trên dữ liệu đã có + nạp lại FTS bằng 1 câu INSERT ... SELECT).
+# Index UNIQUE (mã SV, email) được giữ nguyên: khi append mà trùng dữ liệu cũ thì lỗi ngay ở lô
+# đầu tiên bị trùng, không phải đợi tới lúc build lại index sau khi đã insert hết.
+# DDL của SQLite nằm trong transaction nên lỗi giữa chừng -> rollback toàn bộ.
+
+SEED_BATCH_SIZE = 100000
+
+START_DATE = np.datetime64("2000-01-01")
+END_DATE = np.datetime64("2007-12-31")
+
+INSERT_SQL = (
+    "INSERT INTO students (student_id, first_name, last_name, email, birth_date, hometown, "
+    "math, literature, english, created_at, updated_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+)
+
+def generate_batch(
+    rng: np.random.Generator,
+    start_index: int,
+    size: int,
+    first_names: Sequence[str],
+    last_names: Sequence[str],
+    hometowns: Sequence[str]
+) -> List[tuple]:
+    """Sinh `size` sinh viên (mã SV từ start_index) theo cột, trả về list tuple theo INSERT_SQL"""
+    indexes = np.arange(start_index, start_index + size)
+    first = np.asarray(first_names)[rng.integers(0, len(first_names), size)]
+    last = np.asarray(last_names)[rng.integers(0, len(last_names), size)]
+
+    # Email: 70% Gmail "ho.ten.<index>@gmail.com" (ho/ten viết thường, bỏ khoảng trắng), 30% email rác
+    index_str = indexes.astype(str)
+    clean_first = np.char.replace(np.char.lower(first), " ", "")
+    clean_last = np.char.replace(np.char.lower(last), " ", "")
+    user = np.where(clean_last == "", clean_first, np.char.add(np.char.add(clean_first, "."), clean_last))
+    gmail = np.char.add(np.char.add(np.char.add(user, "."), index_str), "@gmail.com")
+    fake = np.char.add(np.char.add("fake_email_", index_str), "@not-exist-domain.com")
+    email = np.where(rng.random(size) < 0.7, gmail, fake)
+
+    days = (END_DATE - START_DATE).astype(int)
+    birth_date = np.datetime_as_string(START_DATE + rng.integers(0, days, size), unit="D")
+
+    math = np.round(rng.uniform(0, 10, size), 1)
+    literature = np.round(rng.uniform(0, 10, size), 1)
+    english = np.where(rng.random(size) < 0.2, 0.0, np.round(rng.uniform(0, 10, size), 1))
+
+    student_id = np.char.add("SV", np.char.zfill(index_str, 3))
+    hometown = np.asarray(hometowns)[rng.integers(0, len(hometowns), size)]
+
+    # .tolist() chuyển cả cột sang kiểu Python 1 lần (nhanh hơn nhiều so với từng phần tử)
+    return list(zip(
+        student_id.tolist(), first.tolist(), last.tolist(), email.tolist(), birth_date.tolist(),
+        hometown.tolist(), math.tolist(), literature.tolist(), english.tolist()
+    ))
+
+def iter_batches(rows: int, start_index: int, seed: int, batch_size: int, **names) -> Iterator[List[tuple]]:
+    rng = np.random.default_rng(seed)
+    for offset in range(0, rows, batch_size):
+        yield generate_batch(rng, start_index + offset, min(batch_size, rows - offset), **names)
+
+def seed_students(
+    rows: int,
+    first_names: Sequence[str],
+    last_names: Sequence[str],
+    hometowns: Sequence[str],
+    seed: int = 42,
+    append: bool = False,
+    engine=None,
+    batch_size: int = SEED_BATCH_SIZE
+) -> dict:
+    """
+    Nạp `rows` sinh viên vào DB trong 1 transaction.
+    append=False: xóa sạch dữ liệu cũ (kể cả nhật ký xóa của change feed), mã SV bắt đầu từ 1.
+    append=True: giữ dữ liệu cũ, mã SV tiếp nối sau id lớn nhất.
+    """
+    engine = engine or database.engine
+    models.init_db(engine)  # đảm bảo bảng/cột mới có đủ trước khi ghi
+    table = models.Student.__table__
+    start = time.perf_counter()
+
+    with engine.begin() as conn:
+        # pysqlite chỉ tự BEGIN trước lệnh ghi dữ liệu, DDL chạy trước đó sẽ tự commit
+        # -> BEGIN tường minh để cả DDL lẫn INSERT nằm trong cùng 1 transaction
+        conn.exec_driver_sql("BEGIN")
+
+        # 1. Bỏ trigger + index phụ không UNIQUE (tạo lại ở bước 4)
+        triggers = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'students'"
+        )).scalars().all()
+        for name in triggers:
+            conn.execute(text(f'DROP TRIGGER "{name}"'))
+        for index in table.indexes:
+            if index.unique:
+                continue
+            conn.execute(text(f'DROP INDEX IF EXISTS "{index.name}"'))
+
+        # 2. Dữ liệu cũ
+        if append:
+            start_index = (conn.execute(text("SELECT max(id) FROM students")).scalar() or 0) + 1
+        else:
+            conn.execute(text("DELETE FROM students"))
+            conn.execute(text(f"DELETE FROM {models.StudentDeletion.__tablename__}"))
+            conn.execute(text(f"DELETE FROM {models.SEARCH_TABLE}"))
+            start_index = 1
+
+        # 3. executemany thẳng trên connection sqlite3 (không qua tầng compile của SQLAlchemy)
+        cursor = conn.connection.driver_connection.cursor()
+        names = dict(first_names=first_names, last_names=last_names, hometowns=hometowns)
+        try:
+            for batch in iter_batches(rows, start_index, seed, batch_size, **names):
+                cursor.executemany(INSERT_SQL, batch)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Trung ma sinh vien / email voi du lieu da co ({e}), da rollback") from e
+        finally:
+            cursor.close()
+        insert_seconds = time.perf_counter() - start
+
+        # 4. Tạo lại index, trigger, FTS index (vẫn trong transaction)
+        models.init_db(conn)
+
+    return {
+        "rows": rows,
+        "first_student_id": start_index,
+        "insert_seconds": insert_seconds,
+        "total_seconds": time.perf_counter() - start,
+    }
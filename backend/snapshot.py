@@ -0,0 +1,172 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Chạy được cả khi đứng ở thư mục gốc lẫn thư mục backend
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+import database
+
+# ===== SNAPSHOT / RESTORE DATABASE =====
+# Lưu và khôi phục nguyên trạng file SQLite bằng online backup API (sqlite3.Connection.backup):
+# chép theo page nên nhanh hơn nhiều so với xóa + seed lại, và an toàn cả khi API đang chạy
+# (backup giữ khóa đọc/ghi đúng chuẩn, không chép file đang ghi dở).
+# Snapshot là file .db trong data/snapshots/ (không commit lên git).
+#
+# Cách chạy:
+#   python backend/snapshot.py build 100k     # seed fixture chuẩn (NumPy, seed cố định) rồi lưu snapshot
+#   python backend/snapshot.py save truoc-crawl
+#   python backend/snapshot.py restore 1M
+#   python backend/snapshot.py list
+
+SNAPSHOT_DIR = os.path.join(BACKEND_DIR, "data", "snapshots")
+
+# Fixture chuẩn cho benchmark / crawl: tên -> số dòng
+FIXTURES = {"1k": 1000, "100k": 100000, "1M": 1000000}
+FIXTURE_SEED = 42
+
+def default_db_path() -> str:
+    """Đường dẫn file DB của API (theo STUDENT_DATABASE_URL), tính từ thư mục backend như khi chạy main.py"""
+    path = database.engine.url.database
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(BACKEND_DIR, path))
+
+def snapshot_path(name: str) -> str:
+    if not name or os.path.basename(name) != name or name.startswith("."):
+        raise ValueError(f"Ten snapshot khong hop le: {name!r}")
+    return os.path.join(SNAPSHOT_DIR, f"{name}.db")
+
+def copy_database(source_path: str, target_path: str, source_readonly: bool = False):
+    """
+    Chép toàn bộ DB source -> target bằng backup API (1 bước, mọi page).
+    Phía đích tắt journal + fsync trong lúc chép: nội dung bị ghi đè hoàn toàn nên không cần
+    khả năng rollback, và nhanh hơn ~2-4 lần (lỗi giữa chừng -> chỉ cần restore lại).
+    """
+    source_uri = f"file:{source_path}?mode=ro" if source_readonly else f"file:{source_path}"
+    source = sqlite3.connect(source_uri, uri=True)
+    target = sqlite3.connect(target_path)
+    try:
+        try:
+            target.execute("PRAGMA journal_mode=OFF")
+        except sqlite3.OperationalError:
+            pass  # DB đích đang ở WAL và có connection khác -> giữ nguyên journal
+        target.execute("PRAGMA synchronous=OFF")
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def save_snapshot(name: str, db_path: str = None) -> str:
+    """Lưu DB hiện tại thành snapshot `name` (ghi vào file tạm rồi đổi tên -> không để lại snapshot dở)"""
+    db_path = db_path or default_db_path()
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Khong tim thay database: {db_path}")
+    path = snapshot_path(name)
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".db", dir=SNAPSHOT_DIR)
+    os.close(fd)
+    try:
+        copy_database(db_path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+def restore_snapshot(name: str, db_path: str = None) -> str:
+    """Ghi đè DB bằng snapshot `name`"""
+    path = snapshot_path(name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Chua co snapshot '{name}' (tao bang: snapshot.py save/build {name})")
+    db_path = db_path or default_db_path()
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    copy_database(path, db_path, source_readonly=True)
+    return db_path
+
+def build_fixture(name: str, rows: int = None, seed: int = FIXTURE_SEED) -> str:
+    """Seed 1 DB tạm bằng seed_direct (dữ liệu cố định theo seed) rồi lưu thành snapshot `name`"""
+    import seed_direct
+    from generate_via_api import FIRST_NAMES, HOMETOWNS, LAST_NAMES
+
+    rows = rows or FIXTURES[name]
+    tmp_dir = tempfile.mkdtemp(prefix="snapshot_build_")
+    tmp_db = os.path.join(tmp_dir, "students.db")
+    engine = database.create_sqlite_engine(f"sqlite:///{tmp_db}", profile="default")
+    try:
+        seed_direct.seed_students(
+            rows=rows,
+            first_names=[n for n in FIRST_NAMES if n.strip()],
+            last_names=[n for n in LAST_NAMES if n.strip()],
+            hometowns=HOMETOWNS,
+            seed=seed,
+            engine=engine,
+        )
+        engine.dispose()
+        with sqlite3.connect(tmp_db) as conn:
+            conn.execute("VACUUM")  # snapshot gọn, restore chép ít page hơn
+        return save_snapshot(name, tmp_db)
+    finally:
+        engine.dispose()
+        for file_name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, file_name))
+        os.rmdir(tmp_dir)
+
+def list_snapshots() -> list:
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    result = []
+    for file_name in sorted(os.listdir(SNAPSHOT_DIR)):
+        if file_name.endswith(".db") and not file_name.startswith("."):
+            path = os.path.join(SNAPSHOT_DIR, file_name)
+            with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as conn:
+                count = conn.execute("SELECT count(*) FROM students").fetchone()[0]
+            result.append((file_name[:-3], count, os.path.getsize(path)))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot / restore database SQLite (online backup API)")
+    parser.add_argument("--db", help="File DB (mặc định: DB của API)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("save", help="Lưu DB hiện tại thành snapshot").add_argument("name")
+    commands.add_parser("restore", help="Khôi phục DB từ snapshot").add_argument("name")
+    build = commands.add_parser("build", help=f"Tạo fixture chuẩn ({', '.join(FIXTURES)}) bằng seed trực tiếp")
+    build.add_argument("name")
+    build.add_argument("--rows", type=int, help="Số dòng (bắt buộc nếu tên không phải fixture chuẩn)")
+    build.add_argument("--seed", type=int, default=FIXTURE_SEED)
+    commands.add_parser("list", help="Liệt kê snapshot")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        run_command(parser, args)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"⛔ {e}")
+        sys.exit(1)
+    if args.command != "list":
+        print(f"⏱️  {time.perf_counter() - start:.2f}s")
+
+def run_command(parser, args):
+    if args.command == "save":
+        path = save_snapshot(args.name, args.db)
+        print(f"💾 Đã lưu snapshot '{args.name}': {path}")
+    elif args.command == "restore":
+        path = restore_snapshot(args.name, args.db)
+        print(f"♻️  Đã khôi phục '{args.name}' -> {path}")
+        print("   Lưu ý: nếu API đang chạy, response cache trong process còn giữ tối đa STUDENT_CACHE_TTL giây.")
+    elif args.command == "build":
+        if args.name not in FIXTURES and not args.rows:
+            parser.error(f"Fixture '{args.name}' khong co san, can truyen --rows")
+        path = build_fixture(args.name, args.rows, args.seed)
+        print(f"🏗️  Đã tạo fixture '{args.name}': {path}")
+    else:
+        snapshots = list_snapshots()
+        if not snapshots:
+            print("(chưa có snapshot)")
+        for name, count, size in snapshots:
+            print(f"{name:<20} {count:>10,} dòng {size / 1024 / 1024:>10.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import json
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy import String, cast
+
+import crud, database, models, pagination, schemas
+
+# ===== JSON ENCODER =====
+# orjson (tùy chọn, `pip install orjson`) nhanh hơn json chuẩn nhiều lần và
+# tự serialize được date/datetime. Không có thì fallback về json chuẩn.
+try:
+    import orjson
+
+    def dumps(value) -> bytes:
+        return orjson.dumps(value)
+except ImportError:
+    def dumps(value) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+# MessagePack (tùy chọn, `pip install msgpack`): nhị phân, gọn hơn JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# ===== STREAMING DANH SÁCH SINH VIÊN =====
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Số dòng lấy từ cursor SQLite cho mỗi lần yield
+STREAM_BATCH_SIZE = 1000
+
+# Chỉ select đúng các cột của StudentResponse (Core query, không tạo ORM object)
+STUDENT_COLUMNS = [
+    models.Student.id,
+    models.Student.student_id,
+    models.Student.first_name,
+    models.Student.last_name,
+    models.Student.email,
+    models.Student.birth_date,
+    models.Student.hometown,
+    models.Student.math,
+    models.Student.literature,
+    models.Student.english,
+    models.Student.avg_score,
+    models.Student.rank,
+]
+
+# Cột theo tên, birth_date lấy nguyên chuỗi 'YYYY-MM-DD' từ SQLite (bỏ bước parse sang date
+# của SQLAlchemy) -> encode thẳng được bằng JSON / MessagePack / CSV
+RAW_COLUMNS = {
+    column.key: cast(column, String).label("birth_date") if column.key == "birth_date" else column
+    for column in STUDENT_COLUMNS
+}
+
+# ===== PROJECTION (?fields=) VÀ ĐỊNH DẠNG GỌN =====
+# Dạng cột: {"columns": [...], "data": {cột: [giá trị...]}} -> tên cột không lặp lại ở mỗi dòng
+COLUMNAR_MEDIA_TYPE = "application/vnd.students.columnar+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    "student_id,math" -> ["student_id", "math"] (giữ thứ tự, bỏ trùng).
+    None / rỗng -> None (lấy đủ cột). Raise ValueError nếu có tên cột không hợp lệ.
+    """
+    if not fields:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    invalid = [name for name in names if name not in RAW_COLUMNS]
+    if invalid:
+        raise ValueError(f"Truong khong hop le: {', '.join(invalid)}")
+    return names or None
+
+def to_rows(names: Sequence[str], rows, output: Sequence[str]) -> List[dict]:
+    """Tuple (theo thứ tự names) -> list dict chỉ gồm các cột trong output"""
+    positions = [(name, names.index(name)) for name in output]
+    return [{name: row[i] for name, i in positions} for row in rows]
+
+def to_columnar(names: Sequence[str], rows, output: Sequence[str]) -> dict:
+    """Tuple (theo thứ tự names) -> dạng cột, chỉ gồm các cột trong output"""
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    return {
+        "columns": list(output),
+        "data": {name: list(columns[names.index(name)]) for name in output},
+    }
+
+def iter_student_batches(
+    filters: Optional[schemas.StudentFilter] = None,
+    sort_by: str = "student_id",
+    descending: bool = False,
+    after: Optional[pagination.Cursor] = None,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+    fields: Optional[List[str]] = None
+) -> Iterator[List[dict]]:
+    """
+    Đọc danh sách sinh viên theo từng lô từ server-side cursor.
+    Mở connection riêng từ engine sync: generator này chạy trên threadpool
+    trong lúc StreamingResponse gửi dữ liệu, ở cả chế độ sync lẫn async.
+    `fields`: chỉ select các cột này (None = đủ cột của StudentResponse).
+    """
+    columns = STUDENT_COLUMNS if fields is None else [RAW_COLUMNS[name] for name in fields]
+    remaining = limit
+    with database.engine.connect() as conn:
+        for query in crud.students_queries(columns, filters, sort_by, descending, after):
+            if after is None and skip:
+                query = query.offset(skip)
+            if remaining is not None:
+                if remaining <= 0:
+                    return
+                query = query.limit(remaining)
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+            for partition in result.mappings().partitions():
+                if remaining is not None:
+                    remaining -= len(partition)
+                yield [dict(row) for row in partition]
+
+def ndjson_lines(batches: Iterator[List[dict]]) -> Iterator[bytes]:
+    """Mỗi sinh viên là 1 dòng JSON; mỗi lô được gửi thành 1 chunk"""
+    for batch in batches:
+        yield b"".join(dumps(row) + b"\n" for row in batch)
@@ -1,37 +1,592 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import argparse
+import asyncio
+import hashlib
+import itertools
+import random
 import requests
 import json
+import sqlite3
 import time
 from datetime import datetime
 import os
 
+# Selenium chỉ cần cho engine "selenium"; engine "http" (mặc định) chỉ cần httpx
+try:
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+except ImportError:
+    webdriver = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Parquet cần pyarrow (không có -> chỉ ghi text + JSONL)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
 # ===== CONFIG =====
 API_BASE_URL = "http://localhost:8000"
 
-# TẠO TÊN FILE VỚI TIMESTAMP (YYYYMMDDHHMM)
-# Ví dụ: crawled_students/students_202310271530.txt
-timestamp = datetime.now().strftime("%Y%m%d%H%M")
+# Engine HTTP: số request chi tiết gửi song song, số lần thử lại, timeout mỗi request (giây)
+HTTP_CONCURRENCY = 32
+HTTP_RETRIES = 3
+HTTP_TIMEOUT = 10.0
+RETRY_BACKOFF = 0.2  # chờ 0.2s, 0.4s, 0.8s... (+ jitter) giữa các lần thử
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Danh sách lấy theo trang (keyset cursor qua header X-Next-Cursor), mỗi trang LIST_PAGE_SIZE dòng.
+# Trong RAM chỉ giữ 1 trang, bản ghi được ghi ra file ngay và flush sau mỗi FLUSH_EVERY sinh viên.
+LIST_PAGE_SIZE = 1000
+FLUSH_EVERY = 500
+
+# TẠO TÊN FILE VỚI TIMESTAMP (YYYYMMDDHHMMSS)
+# Ví dụ: crawled_students/students_20231027153012.txt
+# (trùng giây với phiên đã có trong manifest -> thêm hậu tố _2, _3..., xem CrawlCheckpoint.new_file_id)
+timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
 CRAWL_OUTPUT_FILE = f"crawled_students/students_{timestamp}.txt"
 
+def output_file_for(file_id):
+    return f"crawled_students/students_{file_id}.txt"
+
 # Ensure output directory exists
 os.makedirs(os.path.dirname(CRAWL_OUTPUT_FILE), exist_ok=True)
 
-def crawl_students_selenium():
+# Manifest / checkpoint dùng chung cho mọi phiên crawl (SQLite, không commit lên git)
+CHECKPOINT_FILE = "crawled_students/crawl_manifest.db"
+
+# Cùng 1 phiên crawl ghi thêm bản máy đọc được cạnh file text (cùng tên, khác đuôi):
+# - students_<id>.jsonl: mỗi dòng 1 JSON chi tiết sinh viên đúng như API trả về, ghi dần cùng file text
+# - students_<id>.parquet: chuyển từ JSONL khi crawl xong (theo lô PARQUET_BATCH_SIZE dòng)
+# analysis/analyze.py ưu tiên đọc Parquet -> JSONL -> text.
+PARQUET_BATCH_SIZE = 50000
+CRAWL_COLUMNS = [
+    ("id", "int64"), ("student_id", "string"), ("first_name", "string"), ("last_name", "string"),
+    ("email", "string"), ("birth_date", "string"), ("hometown", "string"),
+    ("math", "float64"), ("literature", "float64"), ("english", "float64"),
+    ("avg_score", "float64"), ("rank", "string"),
+]
+
+class CrawlError(Exception):
+    """Không lấy được 1 trang danh sách -> dừng crawl (bỏ qua trang sẽ mất dữ liệu)"""
+
+class CrawlWriter:
+    """
+    Ghi file text (định dạng mà analysis/analyze.py đọc được) theo từng sinh viên ngay khi crawl xong.
+    Dùng với `with`: mở file + ghi header khi vào, ghi footer + đóng file khi ra (kể cả khi lỗi giữa chừng).
+    Song song ghi file JSONL cùng tên (jsonl_path) để phân tích không phải parse lại text.
+    Ghi tiếp phiên dở: truyền resume_offset (vị trí 2 file sau trang cuối đã lưu checkpoint) + start_count,
+    file được cắt tại đó (bỏ footer / dòng ghi dở) rồi ghi tiếp, không ghi lại header.
+    """
+
+    def __init__(self, path, engine_name, total, file_id=None, resume_offset=None, start_count=0, flush_every=FLUSH_EVERY):
+        self.path = path
+        self.jsonl_path = os.path.splitext(path)[0] + ".jsonl"
+        self.engine_name = engine_name
+        self.total = total
+        self.file_id = file_id or timestamp
+        self.resume_offset = resume_offset
+        self.flush_every = flush_every
+        self.count = start_count
+        self.file = None
+        self.jsonl = None
+
+    def __enter__(self):
+        if self.resume_offset is not None:
+            print(f"\nGhi tiếp file: {self.path} (đã có {self.count} sinh viên)...")
+            text_offset, jsonl_offset = self.resume_offset
+            self.file = open(self.path, 'r+', encoding='utf-8')
+            self.file.truncate(text_offset)
+            self.file.seek(text_offset)
+            if not os.path.exists(self.jsonl_path):
+                open(self.jsonl_path, 'w').close()  # phiên bắt đầu trước khi có JSONL
+            self.jsonl = open(self.jsonl_path, 'r+', encoding='utf-8')
+            self.jsonl.truncate(jsonl_offset)
+            self.jsonl.seek(jsonl_offset)
+            return self
+
+        print(f"\nGhi dữ liệu vào file: {self.path}...")
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.jsonl = open(self.jsonl_path, 'w', encoding='utf-8')
+        f = self.file
+        # Header
+        f.write("=" * 90 + "\n")
+        f.write(f"DỮ LIỆU SINH VIÊN CRAWL BẰNG {self.engine_name}\n")
+        f.write("=" * 90 + "\n")
+        f.write(f"Thời gian thực hiện: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"Mã phiên (File ID): {self.file_id}\n")
+        f.write(f"Tổng số sinh viên: {self.total if self.total is not None else 'N/A'}\n")
+        f.write(f"Nguồn dữ liệu: {API_BASE_URL}\n")
+        f.write("=" * 90 + "\n\n")
+        return self
+
+    def write(self, student):
+        self.count += 1
+        f = self.file
+        f.write(f"[{self.count}] MÃ SINH VIÊN: {student.get('student_id', 'N/A')}\n")
+        f.write(f"    ID Database: {student.get('id', 'N/A')}\n")
+        f.write(f"    Họ và tên: {student.get('last_name', '')} {student.get('first_name', '')}\n")
+        f.write(f"    Email: {student.get('email', 'N/A')}\n")
+        f.write(f"    Ngày sinh: {student.get('birth_date', 'N/A')}\n")
+        f.write(f"    Quê quán: {student.get('hometown', 'N/A')}\n")
+        f.write(f"    Điểm (Toán/Văn/Anh): {student.get('math', 'N/A')} - {student.get('literature', 'N/A')} - {student.get('english', 'N/A')}\n")
+        f.write(f"\n")
+        self.jsonl.write(json.dumps(student, ensure_ascii=False) + "\n")
+        if self.count % self.flush_every == 0:
+            f.flush()
+            self.jsonl.flush()
+
+    def position(self):
+        """Flush rồi trả về vị trí hiện tại trong file text + JSONL (lưu vào checkpoint sau mỗi trang)"""
+        self.file.flush()
+        self.jsonl.flush()
+        return self.file.tell(), self.jsonl.tell()
+
+    def __exit__(self, exc_type, exc, tb):
+        # Footer
+        self.file.write("=" * 90 + "\n")
+        self.file.write("KẾT THÚC DỮ LIỆU\n")
+        self.file.write("=" * 90 + "\n")
+        self.file.close()
+        self.jsonl.close()
+        if exc_type is None:
+            print(f"✅ Ghi file thành công!")
+        else:
+            print(f"⚠️ File chỉ có {self.count} sinh viên đã crawl trước khi lỗi")
+
+        print(f"\n=== TỔNG KẾT PHIÊN CRAWL ===")
+        print(f"📂 File kết quả: {self.path}")
+        print(f"📊 Tổng sinh viên: {self.count}")
+        if self.total is not None and self.count != self.total:
+            print(f"⚠️ Khác số lượng lúc bắt đầu ({self.total}) - dữ liệu thay đổi trong lúc crawl?")
+        print(f"💾 Dung lượng file: {os.path.getsize(self.path)} bytes")
+        print(f"🧾 JSONL: {self.jsonl_path}")
+        return False
+
+def write_parquet(jsonl_path):
+    """Chuyển file JSONL của phiên sang Parquet (ghi theo lô, bộ nhớ không tăng theo số dòng); trả về đường dẫn"""
+    if pa is None:
+        print("⚠️ Bỏ qua Parquet: cần thư viện pyarrow (pip install pyarrow)")
+        return None
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in CRAWL_COLUMNS])
+    parquet_path = os.path.splitext(jsonl_path)[0] + ".parquet"
+    tmp_path = parquet_path + ".tmp"
+    with open(jsonl_path, encoding='utf-8') as source, pq.ParquetWriter(tmp_path, schema) as writer:
+        batch = []
+        for line in source:
+            student = json.loads(line)
+            if student.get("birth_date") is not None:
+                student["birth_date"] = str(student["birth_date"])
+            batch.append(student)
+            if len(batch) >= PARQUET_BATCH_SIZE:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    os.replace(tmp_path, parquet_path)
+    print(f"📦 Parquet: {parquet_path}")
+    return parquet_path
+
+# ===== CHECKPOINT / MANIFEST =====
+# Lưu trong CHECKPOINT_FILE:
+# - crawl_runs: mỗi phiên crawl (file kết quả, cursor trang kế tiếp, số sinh viên + vị trí file
+#   sau trang cuối đã ghi). Phiên chưa xong -> lần chạy sau ghi tiếp vào đúng file đó từ cursor đã lưu.
+# - crawl_records: bản chi tiết mới nhất đã crawl của từng sinh viên + hash của dòng trong danh sách.
+#   Chế độ incremental: dòng danh sách có hash trùng -> dùng lại bản đã lưu, chỉ gọi API chi tiết
+#   cho sinh viên mới / đã thay đổi. Hash tính trên nội dung dòng danh sách (họ tên, email, ngày sinh,
+#   quê quán, điểm...; dòng danh sách không có updated_at) -> sửa các trường này là hash đổi, còn thay đổi
+#   chỉ có ở API chi tiết mà không hiện trong danh sách thì không phát hiện được (cần chạy lại không incremental).
+# Checkpoint được commit sau mỗi trang, cùng lúc với vị trí file -> dừng đột ngột chỉ mất tối đa 1 trang.
+# next_cursor NULL vừa là "chưa lấy trang nào" vừa là "đã ghi trang cuối" -> cột exhausted phân biệt 2 trường hợp:
+# phiên đã ghi hết danh sách nhưng dừng trước finish_run thì lần sau chỉ hoàn tất (footer, Parquet, manifest).
+
+CHECKPOINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_runs (
+    file_id TEXT PRIMARY KEY,
+    output_file TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    incremental INTEGER NOT NULL,
+    status TEXT NOT NULL,           -- running / done / abandoned
+    next_cursor TEXT,
+    exhausted INTEGER NOT NULL DEFAULT 0,  -- 1: trang cuối đã được ghi
+    count INTEGER NOT NULL DEFAULT 0,
+    file_offset INTEGER,
+    jsonl_offset INTEGER,
+    fetched INTEGER NOT NULL DEFAULT 0,
+    reused INTEGER NOT NULL DEFAULT 0,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS crawl_records (
+    id INTEGER PRIMARY KEY,
+    student_id TEXT,
+    row_hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    last_file_id TEXT NOT NULL
+);
+"""
+
+def row_hash(student):
+    return hashlib.sha1(json.dumps(student, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class CrawlCheckpoint:
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(CHECKPOINT_SCHEMA)
+        # Manifest tạo từ phiên bản cũ hơn (trước khi có file JSONL / cột exhausted) -> thêm cột
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(crawl_runs)")]
+        if "jsonl_offset" not in columns:
+            self.conn.execute("ALTER TABLE crawl_runs ADD COLUMN jsonl_offset INTEGER")
+        if "exhausted" not in columns:
+            self.conn.execute("ALTER TABLE crawl_runs ADD COLUMN exhausted INTEGER NOT NULL DEFAULT 0")
+        self.run = None
+
+    def new_file_id(self):
+        """Mã phiên mới theo timestamp; trùng phiên cũ (chạy 2 lần trong cùng 1 giây) -> thêm hậu tố _2, _3..."""
+        file_id, suffix = timestamp, 1
+        while self.conn.execute("SELECT 1 FROM crawl_runs WHERE file_id = ?", (file_id,)).fetchone() \
+                or os.path.exists(output_file_for(file_id)):
+            suffix += 1
+            file_id = f"{timestamp}_{suffix}"
+        return file_id
+
+    def open_run(self, engine, incremental, fresh=False):
+        """
+        Lấy phiên dở gần nhất (nếu còn file kết quả) hoặc tạo phiên mới; trả về dict thông tin phiên.
+        Phiên dở chạy ở chế độ khác với `incremental` -> ValueError (dùng đúng cờ hoặc --fresh).
+        run["exhausted"]: phiên dở đã ghi hết danh sách, chỉ cần finalize_run (không crawl lại).
+        """
+        columns = (
+            "file_id", "output_file", "engine", "incremental", "next_cursor", "exhausted", "count", "file_offset",
+            "jsonl_offset"
+        )
+        row = self.conn.execute(
+            f"SELECT {', '.join(columns)} FROM crawl_runs WHERE status = 'running' ORDER BY started_at DESC LIMIT 1"
+        ).fetchone()
+        with self.conn:
+            if row is not None and (fresh or not os.path.exists(row[1])):
+                self.conn.execute("UPDATE crawl_runs SET status = 'abandoned' WHERE status = 'running'")
+                row = None
+            if row is not None:
+                self.run = dict(zip(columns, row), resumed=True)
+                self.run["incremental"] = bool(self.run["incremental"])
+                self.run["exhausted"] = bool(self.run["exhausted"])
+                if self.run["incremental"] != incremental and not self.run["exhausted"]:
+                    mode = "có" if self.run["incremental"] else "không có"
+                    raise ValueError(
+                        f"Phiên dở {self.run['file_id']} đang chạy {mode} --incremental. "
+                        f"Chạy lại {mode} --incremental để tiếp tục, hoặc thêm --fresh để bỏ phiên dở."
+                    )
+                if self.run["file_offset"] is not None:
+                    self.run["file_offset"] = (self.run["file_offset"], self.run["jsonl_offset"] or 0)
+            else:
+                self.conn.execute("UPDATE crawl_runs SET status = 'abandoned' WHERE status = 'running'")
+                file_id = self.new_file_id()
+                self.run = dict(
+                    file_id=file_id, output_file=output_file_for(file_id), engine=engine, incremental=incremental,
+                    next_cursor=None, exhausted=False, count=0, file_offset=None, jsonl_offset=None, resumed=False
+                )
+                self.conn.execute(
+                    "INSERT INTO crawl_runs (file_id, output_file, engine, incremental, status, started_at) "
+                    "VALUES (?, ?, ?, ?, 'running', ?)",
+                    (file_id, self.run["output_file"], engine, int(incremental), datetime.now().isoformat(timespec="seconds"))
+                )
+        return self.run
+
+    def plan_page(self, students):
+        """
+        -> list (student, hash, bản chi tiết đã lưu hoặc None nếu phải crawl).
+        Không ở chế độ incremental -> crawl lại tất cả.
+        """
+        hashes = [row_hash(student) for student in students]
+        known = {}
+        if self.run["incremental"]:
+            ids = [student.get("id") for student in students]
+            for start in range(0, len(ids), 900):  # giới hạn số tham số của SQLite
+                chunk = ids[start:start + 900]
+                known.update(
+                    (record_id, (record_hash, data)) for record_id, record_hash, data in self.conn.execute(
+                        f"SELECT id, row_hash, data FROM crawl_records WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+                )
+        plan = []
+        for student, hashed in zip(students, hashes):
+            record = known.get(student.get("id"))
+            plan.append((student, hashed, json.loads(record[1]) if record and record[0] == hashed else None))
+        return plan
+
+    def save_page(self, records, reused_ids, next_cursor, writer):
+        """
+        Commit 1 trang: bản ghi mới crawl (id, student_id, hash, chi tiết), id các bản dùng lại
+        (đánh dấu vẫn còn trong danh sách) + vị trí tiếp tục của phiên.
+        next_cursor None = đây là trang cuối -> đánh dấu exhausted.
+        """
+        file_id = self.run["file_id"]
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE crawl_records SET last_file_id = ? WHERE id = ?", [(file_id, record_id) for record_id in reused_ids]
+            )
+            self.conn.executemany(
+                "INSERT INTO crawl_records (id, student_id, row_hash, data, last_file_id) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET student_id = excluded.student_id, row_hash = excluded.row_hash, "
+                "data = excluded.data, last_file_id = excluded.last_file_id",
+                [(record_id, code, hashed, json.dumps(detail, ensure_ascii=False), file_id)
+                 for record_id, code, hashed, detail in records]
+            )
+            text_offset, jsonl_offset = writer.position()
+            self.conn.execute(
+                "UPDATE crawl_runs SET next_cursor = ?, exhausted = ?, count = ?, file_offset = ?, jsonl_offset = ?, "
+                "fetched = fetched + ?, reused = reused + ? WHERE file_id = ?",
+                (next_cursor, int(next_cursor is None), writer.count, text_offset, jsonl_offset, len(records), len(reused_ids), file_id)
+            )
+
+    def finish_run(self):
+        """Phiên chạy hết danh sách: đánh dấu xong, bỏ bản ghi của sinh viên không còn trong danh sách"""
+        file_id = self.run["file_id"]
+        with self.conn:
+            self.conn.execute(
+                "UPDATE crawl_runs SET status = 'done', finished_at = ? WHERE file_id = ?",
+                (datetime.now().isoformat(timespec="seconds"), file_id)
+            )
+            self.conn.execute("DELETE FROM crawl_records WHERE last_file_id != ?", (file_id,))
+
+    def close(self):
+        self.conn.close()
+
+def list_params(cursor, page_size, with_total=False):
+    params = {"limit": page_size}
+    if cursor:
+        params["cursor"] = cursor
+    if with_total:
+        params["with_total"] = "true"  # trang đầu: API trả thêm header X-Total-Count (COUNT(*), rẻ)
+    return params
+
+def total_from_headers(headers):
+    """Tổng số sinh viên từ header X-Total-Count; API cũ không có header -> None (ghi N/A)"""
+    value = headers.get("X-Total-Count")
+    return int(value) if value and value.isdigit() else None
+
+def open_writer(run, engine_name, total):
+    """CrawlWriter cho phiên `run`: phiên mới -> file mới, phiên dở -> ghi tiếp tại vị trí đã lưu"""
+    if run["resumed"]:
+        print(f"♻️  Tiếp tục phiên {run['file_id']} từ sinh viên thứ {run['count'] + 1}"
+              f"{' (incremental)' if run['incremental'] else ''}")
+    elif run["incremental"]:
+        print("🔁 Chế độ incremental: chỉ crawl chi tiết sinh viên mới / đã thay đổi")
+    return CrawlWriter(
+        run["output_file"], engine_name, total, file_id=run["file_id"],
+        resume_offset=run["file_offset"], start_count=run["count"]
+    )
+
+def finalize_run(checkpoint, engine_name):
+    """
+    Phiên dở đã ghi trang cuối nhưng dừng trước finish_run: không crawl lại, chỉ cắt file về vị trí
+    đã lưu + ghi footer, đánh dấu xong trong manifest và tạo Parquet; trả về số sinh viên trong file
+    """
+    run = checkpoint.run
+    print(f"♻️  Phiên {run['file_id']} đã crawl hết danh sách ({run['count']} sinh viên), chỉ hoàn tất file kết quả")
+    with CrawlWriter(
+        run["output_file"], engine_name, None, file_id=run["file_id"],
+        resume_offset=run["file_offset"], start_count=run["count"]
+    ) as writer:
+        pass
+    checkpoint.finish_run()
+    write_parquet(writer.jsonl_path)
+    return writer.count
+
+# ===== ENGINE HTTP (httpx async) =====
+# Gọi thẳng API chi tiết /students/{id} bằng 1 AsyncClient dùng chung pool connection (keep-alive),
+# tối đa `concurrency` request cùng lúc. Lỗi mạng / timeout / 429 / 5xx -> thử lại với backoff
+# lũy thừa; hết lượt thử (hoặc 404) -> giữ dữ liệu cơ bản từ danh sách tổng như engine Selenium.
+# Trang danh sách kế tiếp được tải song song trong lúc crawl chi tiết trang hiện tại.
+
+class CrawlStats:
+    def __init__(self):
+        self.done = 0
+        self.retries = 0
+        self.failed = 0
+        self.reused = 0
+
+async def get_with_retry(client, url, retries, stats, params=None):
+    """
+    GET có thử lại tối đa `retries` lần khi lỗi mạng / timeout / 429 / 5xx.
+    Trả về response (kể cả 4xx khác - thử lại cũng không khác), hết lượt thử -> raise CrawlError.
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(url, params=params)
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            error = f"HTTP {response.status_code}"
+        except httpx.TransportError as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if attempt < retries:
+            stats.retries += 1
+            delay = RETRY_BACKOFF * (2 ** attempt)
+            await asyncio.sleep(delay + random.uniform(0, delay))
+    raise CrawlError(f"{url} lỗi sau {retries + 1} lần thử: {error}")
+
+async def fetch_detail(client, student, retries, stats):
+    """GET chi tiết 1 sinh viên; trả về None nếu không lấy được"""
+    try:
+        response = await get_with_retry(client, f"/students/{student.get('id')}", retries, stats)
+        response.raise_for_status()
+        return response.json()
+    except (CrawlError, httpx.HTTPStatusError, ValueError) as e:
+        print(f"⚠️ Lỗi crawl {student.get('student_id', 'N/A')}: {str(e)}")
+        return None
+
+async def fetch_list_page(client, cursor, page_size, retries, stats, with_total=False):
+    """1 trang danh sách -> (sinh viên, cursor trang sau hoặc None nếu là trang cuối, tổng số SV nếu with_total)"""
+    params = list_params(cursor, page_size, with_total)
+    response = await get_with_retry(client, "/students/", retries, stats, params=params)
+    if response.is_error:
+        raise CrawlError(f"Lấy danh sách lỗi HTTP {response.status_code}: {response.text[:200]}")
+    return response.json(), response.headers.get("X-Next-Cursor"), total_from_headers(response.headers)
+
+async def crawl_page_details(client, students, concurrency, retries, stats):
+    """Crawl chi tiết 1 trang, giữ nguyên thứ tự danh sách (None = không lấy được)"""
+    results = [None] * len(students)
+    positions = iter(range(len(students)))
+
+    async def worker():
+        # `concurrency` worker cùng lấy vị trí tiếp theo -> không tạo trước 1 task cho mỗi sinh viên
+        for position in positions:
+            results[position] = await fetch_detail(client, students[position], retries, stats)
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(students)) or 1)))
+    return results
+
+def write_page(writer, checkpoint, plan, details, next_cursor, stats):
+    """Ghi 1 trang ra file theo thứ tự danh sách rồi commit checkpoint"""
+    records, reused_ids = [], []
+    fetched = iter(details)
+    for student, hashed, cached in plan:
+        if cached is not None:
+            detail = cached
+            reused_ids.append(student.get("id"))
+        else:
+            detail = next(fetched)
+            if detail is None:
+                # Không lấy được chi tiết: ghi dữ liệu từ danh sách, không lưu vào manifest (lần sau crawl lại)
+                stats.failed += 1
+                detail = student
+            else:
+                records.append((student.get("id"), student.get("student_id"), hashed, detail))
+        writer.write(detail)
+    checkpoint.save_page(records, reused_ids, next_cursor, writer)
+    stats.done += len(plan)
+    stats.reused += len(reused_ids)
+
+async def crawl_http(checkpoint, engine_name, concurrency, retries, timeout, page_size):
+    """Crawl cả phiên trên 1 AsyncClient -> (CrawlStats, CrawlWriter đã đóng)"""
+    stats = CrawlStats()
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    start_cursor = checkpoint.run["next_cursor"]
+    async with httpx.AsyncClient(base_url=API_BASE_URL, timeout=httpx.Timeout(timeout), limits=limits) as client:
+        # Trang đầu lấy kèm tổng số SV (cùng client, cùng retry / timeout) để ghi header trước khi mở file
+        students, cursor, total = await fetch_list_page(client, start_cursor, page_size, retries, stats, with_total=True)
+        with open_writer(checkpoint.run, engine_name, total) as writer:
+            while True:
+                next_page = (
+                    asyncio.ensure_future(fetch_list_page(client, cursor, page_size, retries, stats))
+                    if cursor and students else None
+                )
+                try:
+                    plan = checkpoint.plan_page(students)
+                    pending = [student for student, _, cached in plan if cached is None]
+                    details = await crawl_page_details(client, pending, concurrency, retries, stats)
+                except BaseException:
+                    if next_page is not None:
+                        next_page.cancel()
+                    raise
+                write_page(writer, checkpoint, plan, details, cursor if students else None, stats)
+                if students:
+                    print(f"[{writer.count}/{writer.total or '?'}] Đã crawl tới {students[-1].get('student_id', 'N/A')}...")
+                if next_page is None:
+                    break
+                students, cursor, _ = await next_page
+    return stats, writer
+
+def crawl_students_http(checkpoint, concurrency=HTTP_CONCURRENCY, retries=HTTP_RETRIES, timeout=HTTP_TIMEOUT,
+                        page_size=LIST_PAGE_SIZE):
+    """
+    Crawl dữ liệu sinh viên từ API bằng httpx async (không cần trình duyệt)
+    Ghi dần vào text file của phiên (cùng định dạng với engine Selenium); trả về số sinh viên trong file
+    """
+    if httpx is None:
+        print("❌ Engine http cần thư viện httpx (pip install httpx)")
+        return None
+
+    run = checkpoint.run
+    print("=" * 70)
+    print("CRAWL DỮ LIỆU SINH VIÊN BẰNG HTTP (httpx async)")
+    print("=" * 70)
+    print(f"Thời gian bắt đầu: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"API URL: {API_BASE_URL}")
+    print(f"Song song: {concurrency} request | Thử lại: {retries} lần | Timeout: {timeout}s | Trang: {page_size} dòng")
+    print(f"File đầu ra dự kiến: {run['output_file']}")
+
+    start = time.perf_counter()
+    try:
+        stats, writer = asyncio.run(crawl_http(checkpoint, "HTTP", concurrency, retries, timeout, page_size))
+    except CrawlError as e:
+        print(f"\n❌ Dừng crawl: {str(e)}")
+        print("   Chạy lại lệnh để tiếp tục từ trang đã lưu checkpoint.")
+        return None
+    checkpoint.finish_run()
+    write_parquet(writer.jsonl_path)
+
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {stats.done} sinh viên trong {elapsed:.2f}s ({stats.done / elapsed if elapsed else 0:.0f} sv/s) | "
+          f"dùng lại {stats.reused} | thử lại {stats.retries} | lỗi {stats.failed}")
+    print("\nCrawler hoàn thành!")
+    print("=" * 70)
+    return writer.count
+
+# ===== ENGINE SELENIUM =====
+def iter_list_pages(cursor=None, page_size=LIST_PAGE_SIZE):
+    """
+    Lấy danh sách theo từng trang (requests + X-Next-Cursor)
+    -> (sinh viên, cursor trang sau, tổng số SV - chỉ trang đầu có, các trang sau None)
+    """
+    with requests.Session() as session:
+        with_total = True
+        while True:
+            response = session.get(
+                f"{API_BASE_URL}/students/", params=list_params(cursor, page_size, with_total), timeout=HTTP_TIMEOUT
+            )
+            response.raise_for_status()
+            students = response.json()
+            cursor = response.headers.get("X-Next-Cursor") if students else None
+            yield students, cursor, total_from_headers(response.headers)
+            with_total = False
+            if not cursor:
+                return
+
+def crawl_students_selenium(checkpoint, page_size=LIST_PAGE_SIZE):
     """
     Crawl dữ liệu sinh viên từ API sử dụng Selenium
-    Lưu kết quả vào text file có gắn timestamp
+    Ghi dần vào text file của phiên; trả về số sinh viên trong file
     """
-    
+
+    run = checkpoint.run
     print("=" * 70)
     print("CRAWL DỮ LIỆU SINH VIÊN SỬ DỤNG SELENIUM")
     print("=" * 70)
     print(f"Thời gian bắt đầu: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"API URL: {API_BASE_URL}")
-    print(f"File đầu ra dự kiến: {CRAWL_OUTPUT_FILE}")
-    
+    print(f"File đầu ra dự kiến: {run['output_file']}")
+
+    if webdriver is None:
+        print("❌ Engine selenium cần thư viện selenium (pip install selenium)")
+        return None
+
     try:
         # ===== BƯỚC 1: KHỞI ĐỘNG SELENIUM =====
         print("\nKhởi động Selenium WebDriver...")
@@ -39,108 +594,104 @@ def crawl_students_selenium():
         # options.add_argument("--headless")  # Bỏ comment nếu muốn chạy ẩn
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-dev-shm-usage")
-        
+
         driver = webdriver.Chrome(options=options)
         print("WebDriver khởi động thành công")
-        
-        # ===== BƯỚC 2: GET DANH SÁCH SINH VIÊN =====
-        print("\nLấy danh sách sinh viên từ API...")
-        try:
-            response = requests.get(f"{API_BASE_URL}/students")
-            response.raise_for_status()
-            students = response.json()
-            print(f"Lấy được {len(students)} sinh viên từ danh sách tổng")
-        except Exception as e:
-            print(f"Lỗi khi lấy danh sách: {str(e)}")
-            driver.quit()
-            return
-        
-        # ===== BƯỚC 3: CRAWL CHI TIẾT TỪNG SINH VIÊN =====
+
+        # ===== BƯỚC 2: DUYỆT DANH SÁCH THEO TRANG, CRAWL CHI TIẾT, GHI NGAY VÀO FILE =====
         print(f"\nCrawl chi tiết từng sinh viên (sử dụng Selenium)...")
-        
-        crawled_students = []
-        
-        for idx, student in enumerate(students, 1):
-            student_id = student.get('id')
-            student_code = student.get('student_id', 'N/A')
-            
-            try:
-                # Truy cập API endpoint chi tiết
-                api_url = f"{API_BASE_URL}/students/{student_id}"
-                
-                if idx % 10 == 0 or idx == 1:
-                    print(f"[{idx}/{len(students)}] Đang crawl {student_code}...")
-                
-                # Dùng Selenium để truy cập URL
-                driver.get(api_url)
-                
-                # Chờ trang load (quan trọng để tránh lấy data rỗng)
-                time.sleep(0.1) 
-                
-                # Lấy nội dung JSON từ trang (Selenium lấy toàn bộ text trong thẻ body)
-                body = driver.find_element(By.TAG_NAME, "body").text
-                
-                # Parse JSON response
-                student_data = json.loads(body)
-                crawled_students.append(student_data)
-                
-            except Exception as e:
-                print(f"⚠️ Lỗi crawl {student_code}: {str(e)}")
-                # Nếu lỗi khi crawl chi tiết, vẫn giữ dữ liệu cơ bản từ danh sách tổng
-                crawled_students.append(student)
-        
-        # ===== BƯỚC 4: LƯU VÀO TEXT FILE =====
-        print(f"\nĐang lưu dữ liệu vào file: {CRAWL_OUTPUT_FILE}...")
-        
-        with open(CRAWL_OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            # Header
-            f.write("=" * 90 + "\n")
-            f.write("DỮ LIỆU SINH VIÊN CRAWL BẰNG SELENIUM\n")
-            f.write("=" * 90 + "\n")
-            f.write(f"Thời gian thực hiện: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Mã phiên (File ID): {timestamp}\n")
-            f.write(f"Tổng số sinh viên: {len(crawled_students)}\n")
-            f.write(f"Nguồn dữ liệu: {API_BASE_URL}\n")
-            f.write("=" * 90 + "\n\n")
-            
-            # Chi tiết từng sinh viên
-            for idx, student in enumerate(crawled_students, 1):
-                f.write(f"[{idx}] MÃ SINH VIÊN: {student.get('student_id', 'N/A')}\n")
-                f.write(f"    ID Database: {student.get('id', 'N/A')}\n")
-                f.write(f"    Họ và tên: {student.get('last_name', '')} {student.get('first_name', '')}\n")
-                f.write(f"    Email: {student.get('email', 'N/A')}\n")
-                f.write(f"    Ngày sinh: {student.get('birth_date', 'N/A')}\n")
-                f.write(f"    Quê quán: {student.get('hometown', 'N/A')}\n")
-                f.write(f"    Điểm (Toán/Văn/Anh): {student.get('math', 'N/A')} - {student.get('literature', 'N/A')} - {student.get('english', 'N/A')}\n")
-                f.write(f"\n")
-            
-            # Footer
-            f.write("=" * 90 + "\n")
-            f.write("KẾT THÚC DỮ LIỆU\n")
-            f.write("=" * 90 + "\n")
-        
-        print(f"✅ Ghi file thành công!")
-        
-        # ===== BƯỚC 5: HIỂN THỊ THỐNG KÊ =====
-        print(f"\n=== TỔNG KẾT PHIÊN CRAWL ===")
-        print(f"📂 File kết quả: {CRAWL_OUTPUT_FILE}")
-        print(f"📊 Tổng sinh viên: {len(crawled_students)}")
-        print(f"💾 Dung lượng file: {os.path.getsize(CRAWL_OUTPUT_FILE)} bytes")
-        
+        stats = CrawlStats()
+
+        pages = iter_list_pages(run["next_cursor"], page_size)
+        first_page = next(pages)
+        with open_writer(run, "SELENIUM", first_page[2]) as writer:
+            for students, cursor, _ in itertools.chain([first_page], pages):
+                plan = checkpoint.plan_page(students)
+                details = []
+                for student, _, cached in plan:
+                    if cached is not None:
+                        continue
+                    student_id = student.get('id')
+                    student_code = student.get('student_id', 'N/A')
+
+                    try:
+                        # Truy cập API endpoint chi tiết
+                        api_url = f"{API_BASE_URL}/students/{student_id}"
+
+                        if len(details) % 10 == 0:
+                            print(f"[{writer.count + len(details) + 1}/{writer.total or '?'}] Đang crawl {student_code}...")
+
+                        # Dùng Selenium để truy cập URL
+                        driver.get(api_url)
+
+                        # Chờ trang load (quan trọng để tránh lấy data rỗng)
+                        time.sleep(0.1)
+
+                        # Lấy nội dung JSON từ trang (Selenium lấy toàn bộ text trong thẻ body)
+                        body = driver.find_element(By.TAG_NAME, "body").text
+
+                        # Parse JSON response
+                        details.append(json.loads(body))
+
+                    except Exception as e:
+                        print(f"⚠️ Lỗi crawl {student_code}: {str(e)}")
+                        # Nếu lỗi khi crawl chi tiết, vẫn giữ dữ liệu cơ bản từ danh sách tổng
+                        details.append(None)
+
+                write_page(writer, checkpoint, plan, details, cursor, stats)
+        checkpoint.finish_run()
+        write_parquet(writer.jsonl_path)
+
         # Đóng Selenium
         driver.quit()
-        print("\nCrawler hoàn thành!")
+        print(f"\nCrawler hoàn thành! (dùng lại {stats.reused} | lỗi {stats.failed})")
         print("=" * 70)
-        
-        return crawled_students
-        
+
+        return writer.count
+
     except Exception as e:
         print(f"\n❌ Lỗi nghiêm trọng (Script dừng): {str(e)}")
+        print("   Chạy lại lệnh để tiếp tục từ trang đã lưu checkpoint.")
         try:
             driver.quit()
         except:
             pass
         return None
 
+def main():
+    global API_BASE_URL
+    parser = argparse.ArgumentParser(description="Crawl dữ liệu sinh viên từ API")
+    parser.add_argument("--engine", choices=["http", "selenium"], default="http",
+                        help="http: httpx async, song song (mặc định) | selenium: mở từng trang bằng Chrome")
+    parser.add_argument("--url", default=API_BASE_URL, help="Địa chỉ API")
+    parser.add_argument("--page-size", type=int, default=LIST_PAGE_SIZE, help="Số dòng mỗi trang danh sách")
+    parser.add_argument("--concurrency", type=int, default=HTTP_CONCURRENCY, help="Số request song song (engine http)")
+    parser.add_argument("--retries", type=int, default=HTTP_RETRIES, help="Số lần thử lại mỗi request (engine http)")
+    parser.add_argument("--timeout", type=float, default=HTTP_TIMEOUT, help="Timeout mỗi request, giây (engine http)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Chỉ crawl chi tiết sinh viên mới / thay đổi so với lần crawl trước, còn lại dùng bản đã lưu")
+    parser.add_argument("--fresh", action="store_true", help="Bỏ phiên crawl dở (nếu có), bắt đầu phiên mới")
+    args = parser.parse_args()
+
+    API_BASE_URL = args.url.rstrip("/")
+    page_size = max(1, args.page_size)
+    checkpoint = CrawlCheckpoint()
+    try:
+        try:
+            checkpoint.open_run(args.engine, args.incremental, fresh=args.fresh)
+        except ValueError as e:
+            print(f"⛔ {e}")
+            return
+        if checkpoint.run["exhausted"]:
+            finalize_run(checkpoint, args.engine.upper())
+        elif args.engine == "selenium":
+            crawl_students_selenium(checkpoint, page_size)
+        else:
+            crawl_students_http(checkpoint, max(1, args.concurrency), max(0, args.retries), args.timeout, page_size)
+    except KeyboardInterrupt:
+        print("\n⏹️  Đã dừng. Chạy lại lệnh để tiếp tục từ trang đã lưu checkpoint.")
+    finally:
+        checkpoint.close()
+
 if __name__ == "__main__":
-    crawl_students_selenium()
\ No newline at end of file
+    main()